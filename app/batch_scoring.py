@@ -0,0 +1,147 @@
+# app/batch_scoring.py
+"""
+Scores every post office for schemes and insurance for each calendar month
+and writes the result as a RecommendationTable that the API serves directly.
+
+    python -m app.batch_scoring --output data/recommendations.npz
+"""
+import argparse
+import time
+import numpy as np
+from app.data_loading import (
+    x_store_1,
+    x_store_2,
+    x_store_1_ins,
+    x_store_2_ins,
+    final_df,
+    model_1,
+    model_2,
+    model_1_ins,
+    model_2_ins,
+    data_version,
+)
+from app.nbf_functions import calculate_nbf_matrix, has_demographics
+from app.recommendation_table import RecommendationTable
+from app.utils import (
+    SCHEME_OUTPUT_COLS,
+    INSURANCE_OUTPUT_COLS,
+    final_scores,
+    past_records,
+    past_records_ins,
+    predict_ensemble,
+)
+
+
+def score_all(
+    model1,
+    model2,
+    x_store_1,
+    x_store_2,
+    final_df,
+    months=23,
+    batch_size=512,
+    is_insurance=False,
+):
+    """
+    Returns the scored post office names and their final scores as a
+    (month x post office x scheme) array, as final_scores computes them.
+    """
+    output_cols = INSURANCE_OUTPUT_COLS if is_insurance else SCHEME_OUTPUT_COLS
+    past = past_records_ins if is_insurance else past_records
+
+    # Only post offices that the live pipeline can score
+    names = [
+        name
+        for name in final_df["Post Office Name"].unique()
+        if x_store_1.has_window(name, months)
+        and x_store_2.has_window(name, months)
+        and name in past
+        and has_demographics(name)
+    ]
+
+    ensemble_preds = np.concatenate(
+        [
+            predict_ensemble(
+                names[start : start + batch_size],
+                model1,
+                model2,
+                x_store_1,
+                x_store_2,
+                final_df,
+                months,
+            )
+            for start in range(0, len(names), batch_size)
+        ]
+    )
+
+    past_enrollment = np.stack([past.records(name) for name in names])
+
+    scores = np.empty((12, len(names), len(output_cols)))
+    for current_month in range(1, 13):
+        nbf = calculate_nbf_matrix(current_month, is_insurance).reindex(
+            index=names, columns=output_cols
+        )
+        scores[current_month - 1] = final_scores(
+            ensemble_preds, past_enrollment, nbf.to_numpy()
+        )
+
+    return names, scores
+
+
+def build_recommendation_table(months=23, batch_size=512):
+    tables = {}
+    for kind, models, stores, output_cols, is_insurance in (
+        (
+            "scheme",
+            (model_1, model_2),
+            (x_store_1, x_store_2),
+            SCHEME_OUTPUT_COLS,
+            False,
+        ),
+        (
+            "insurance",
+            (model_1_ins, model_2_ins),
+            (x_store_1_ins, x_store_2_ins),
+            INSURANCE_OUTPUT_COLS,
+            True,
+        ),
+    ):
+        names, scores = score_all(
+            *models,
+            *stores,
+            final_df,
+            months=months,
+            batch_size=batch_size,
+            is_insurance=is_insurance,
+        )
+        tables[kind] = {
+            "names": np.array(names, dtype=str),
+            "cols": np.array(output_cols, dtype=str),
+            "scores": scores.astype(np.float32),
+            "ranking": RecommendationTable.rank(scores),
+        }
+    return RecommendationTable(tables, data_version, months)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="data/recommendations.npz")
+    parser.add_argument("--months", type=int, default=23)
+    parser.add_argument("--batch-size", type=int, default=512)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build_recommendation_table(args.months, args.batch_size)
+    table.save(args.output)
+
+    counts = ", ".join(
+        f"{len(table.tables[kind]['names'])} {kind}" for kind in table.tables
+    )
+    print(
+        f"Scored {counts} post offices in {time.perf_counter() - start:.1f}s "
+        f"-> {args.output} (data version {data_version}, {args.months} months)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# app/batching.py
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def _rows(inputs):
+    return len(inputs[0]) if isinstance(inputs, (list, tuple)) else len(inputs)
+
+
+def _concat(batch_inputs):
+    if isinstance(batch_inputs[0], (list, tuple)):
+        return [np.concatenate(branch) for branch in zip(*batch_inputs)]
+    return np.concatenate(batch_inputs)
+
+
+def _fail(pending, error):
+    for _, future, _ in pending:
+        if not future.done():
+            future.set_exception(error)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent predictions against one Keras model.
+
+    Requests are queued on the event loop and flushed as a single batched
+    `model.predict` call once `max_batch_size` rows are waiting or
+    `max_delay` seconds have passed since the first one arrived. `predict`
+    mirrors the Keras signature so a batcher can be passed anywhere a model is
+    expected; it falls back to calling the model directly when the batcher is
+    not running or is called from the event loop thread.
+
+    The model is obtained from `load_model` on first use, so that creating
+    and starting a batcher does not load it. A batched `predict` waits at most
+    `timeout` seconds, and `stop` fails the predictions still queued.
+
+    Batches run on a thread of their own rather than the loop's default
+    executor, which callers blocked in `predict` (e.g. via asyncio.to_thread)
+    could otherwise exhaust.
+    """
+
+    def __init__(self, load_model, max_batch_size=64, max_delay=0.005, timeout=60):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+        self._load_model = load_model
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._loop = None
+        self._loop_thread = None
+        self._queue = None
+        self._worker = None
+        self._executor = None
+
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="micro-batcher"
+        )
+        self._worker = self._loop.create_task(self._run())
+
+    async def stop(self):
+        # Predictions from now on call the model directly
+        self._loop = None
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        if self._queue is not None:
+            queued = []
+            while not self._queue.empty():
+                queued.append(self._queue.get_nowait())
+            _fail(queued, RuntimeError("The micro-batcher stopped."))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._worker = self._queue = self._executor = None
+
+    async def submit(self, inputs):
+        if self._queue is None:
+            raise RuntimeError("The micro-batcher stopped.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((inputs, future, time.perf_counter()))
+        return await future
+
+    def predict(self, inputs, **kwargs):
+        loop = self._loop
+        if loop is None or threading.get_ident() == self._loop_thread:
+            return self.model.predict(inputs, **kwargs)
+        if kwargs:
+            raise TypeError(
+                f"Batched predictions take no arguments, got {', '.join(kwargs)}."
+            )
+        future = asyncio.run_coroutine_threadsafe(self.submit(inputs), loop)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            try:
+                rows = _rows(pending[0][0])
+                deadline = loop.time() + self.max_delay
+
+                while rows < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    pending.append(item)
+                    rows += _rows(item[0])
+
+                await self._flush(pending, rows)
+            except asyncio.CancelledError:
+                _fail(pending, RuntimeError("The micro-batcher stopped."))
+                raise
+
+    async def _flush(self, pending, rows):
+        flushed_at = time.perf_counter()
+        for _, _, enqueued_at in pending:
+            delay = flushed_at - enqueued_at
+            self.queue_delay_total += delay
+            self.queue_delay_max = max(self.queue_delay_max, delay)
+        self.batches += 1
+        self.items += len(pending)
+        self.batch_sizes[rows] += 1
+
+        batch_inputs = [inputs for inputs, _, _ in pending]
+        try:
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                lambda: self.model.predict(_concat(batch_inputs), verbose=0),
+            )
+        except Exception as e:
+            _fail(pending, e)
+            return
+
+        splits = np.cumsum([_rows(inputs) for inputs in batch_inputs])[:-1]
+        for (_, future, _), output in zip(pending, np.split(outputs, splits)):
+            if not future.done():
+                future.set_result(output)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.items,
+            "mean_batch_size": (
+                sum(size * count for size, count in self.batch_sizes.items())
+                / self.batches
+                if self.batches
+                else 0.0
+            ),
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "mean_queue_delay_ms": (
+                1000 * self.queue_delay_total / self.items if self.items else 0.0
+            ),
+            "max_queue_delay_ms": 1000 * self.queue_delay_max,
+        }
@@ -1,45 +1,201 @@
 # app/data_loading.py
+"""
+Models, datasets and the indexes built from them. Every resource is loaded on
+first use through `registry`, so `from app.data_loading import final_df` loads
+final_df (and what it depends on) and nothing else. TensorFlow,
+scikit-learn and the Groq SDK are only imported by the loaders needing them.
+"""
 import os
+import hashlib
+import importlib
 import pickle
 import json
+from functools import partial
 import pandas as pd
-from tensorflow.keras.models import load_model
+from app.recommendation_table import SCORING_VERSION
+from app.registry import ResourceRegistry
 
-# Load the models
-model_1 = load_model("models/final_models/model_dnn_schemes.keras")
-model_2 = load_model("models/final_models/triple_model_scheme.keras")
+# Files whose contents determine the recommendations
+SOURCE_FILES = [
+    "models/final_models/model_dnn_schemes.keras",
+    "models/final_models/triple_model_scheme.keras",
+    "models/final_models/model_dnn_insurence.keras",
+    "models/final_models/triple_model_insurence.keras",
+    "data/x.csv",
+    "data/x_insurence.csv",
+    "data/final_df.csv",
+    "data/numeric_cols_dnn.pkl",
+    "data/numeric_cols_triple.pkl",
+    "data/numeric_cols_insurence_dnn.pkl",
+    "data/triple_model_insurence_columns.pkl",
+    "data/past_scheme_records.csv",
+    "data/past_scheme_insurance_records.csv",
+    "data/Updated_Dataset_with_Rural_and_Urban_Population.csv",
+    "data/aggriculture_dataset.csv",
+]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_fingerprint(paths, version):
+    """
+    Version stamp of the contents of a set of files and of the code `version`
+    that derives results from them. Unlike sizes and mtimes, it survives
+    checkouts, copies and container builds.
+    """
+    digest = hashlib.sha256(f"version:{version}".encode())
+    for path in paths:
+        digest.update(f"{path}:{file_sha256(path)}".encode())
+    return digest.hexdigest()[:16]
+
+
+registry = ResourceRegistry()
+
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "your_groq_api_key_here")
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") or None
+
+
+def __getattr__(name):
+    if name in registry:
+        return registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-model_1_ins = load_model("models/final_models/model_dnn_insurence.keras")
-model_2_ins = load_model("models/final_models/triple_model_insurence.keras")
+
+def load_keras_model(path):
+    registry.get("tensorflow")
+    from tensorflow.keras.models import load_model
+
+    return load_model(path)
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+registry.register("tensorflow", partial(importlib.import_module, "tensorflow"))
+
+# Load the models
+registry.register(
+    "model_1", partial(load_keras_model, "models/final_models/model_dnn_schemes.keras")
+)
+registry.register(
+    "model_2", partial(load_keras_model, "models/final_models/triple_model_scheme.keras")
+)
+registry.register(
+    "model_1_ins",
+    partial(load_keras_model, "models/final_models/model_dnn_insurence.keras"),
+)
+registry.register(
+    "model_2_ins",
+    partial(load_keras_model, "models/final_models/triple_model_insurence.keras"),
+)
 
 # Load data
-x_df = pd.read_csv("data/x.csv")
-y_df = pd.read_csv("data/y_output.csv")
-final_df = pd.read_csv("data/final_df.csv")
+registry.register("x_df", partial(pd.read_csv, "data/x.csv"))
+registry.register("y_df", partial(pd.read_csv, "data/y_output.csv"))
+registry.register("final_df", partial(pd.read_csv, "data/final_df.csv"))
+
+
+@registry.loader("po_index")
+def load_po_index():
+    # Post office name -> id (row of final_df), shared by every store below
+    from app.name_index import PostOfficeIndex
 
-x_df_ins = pd.read_csv("data/x_insurence.csv")
-y_df_ins = pd.read_csv("data/y_output_insurence.csv")
+    return PostOfficeIndex(registry.get("final_df")["Post Office Name"])
 
-numeric_cols_1 = pickle.load(open("data/numeric_cols_dnn.pkl", "rb"))
-numeric_cols_2 = pickle.load(open("data/numeric_cols_triple.pkl", "rb"))
 
-numeric_cols_1_ins = pickle.load(open("data/numeric_cols_insurence_dnn.pkl", "rb"))
-numeric_cols_2_ins = pickle.load(open("data/triple_model_insurence_columns.pkl", "rb"))
+@registry.loader("neighbor_index")
+def load_neighbor_index():
+    # Nearest neighbors of every post office within its cluster
+    from app.neighbors import NeighborIndex
+
+    return NeighborIndex(registry.get("final_df"), registry.get("po_index"))
+
+
+registry.register("x_df_ins", partial(pd.read_csv, "data/x_insurence.csv"))
+registry.register("y_df_ins", partial(pd.read_csv, "data/y_output_insurence.csv"))
+
+registry.register("numeric_cols_1", partial(load_pickle, "data/numeric_cols_dnn.pkl"))
+registry.register("numeric_cols_2", partial(load_pickle, "data/numeric_cols_triple.pkl"))
+
+registry.register(
+    "numeric_cols_1_ins", partial(load_pickle, "data/numeric_cols_insurence_dnn.pkl")
+)
+registry.register(
+    "numeric_cols_2_ins",
+    partial(load_pickle, "data/triple_model_insurence_columns.pkl"),
+)
+
+
+def load_feature_store(x_name, cols_name):
+    from app.feature_store import FeatureStore
+
+    return FeatureStore(
+        registry.get(x_name), registry.get(cols_name), registry.get("po_index")
+    )
+
+
+# Index the monthly features per post office for each model's column set
+registry.register("x_store_1", partial(load_feature_store, "x_df", "numeric_cols_1"))
+registry.register("x_store_2", partial(load_feature_store, "x_df", "numeric_cols_2"))
+
+registry.register(
+    "x_store_1_ins", partial(load_feature_store, "x_df_ins", "numeric_cols_1_ins")
+)
+registry.register(
+    "x_store_2_ins", partial(load_feature_store, "x_df_ins", "numeric_cols_2_ins")
+)
 
 # Load past records and schemes info
-past_sc_r = pd.read_csv("data/past_scheme_records.csv")
-with open("data/post_office_schemes.json", "r") as f:
-    post_office_schemes = json.load(f)
+registry.register("past_sc_r", partial(pd.read_csv, "data/past_scheme_records.csv"))
+registry.register(
+    "past_sc_r_ins", partial(pd.read_csv, "data/past_scheme_insurance_records.csv")
+)
+
+
+@registry.loader("post_office_schemes")
+def load_post_office_schemes():
+    with open("data/post_office_schemes.json", "r") as f:
+        return json.load(f)
+
 
 # Load datasets
-demographics_df = pd.read_csv(
-    "data/Updated_Dataset_with_Rural_and_Urban_Population.csv"
+registry.register(
+    "demographics_df",
+    partial(pd.read_csv, "data/Updated_Dataset_with_Rural_and_Urban_Population.csv"),
 )  # Demographic data
-agriculture_df = pd.read_csv("data/aggriculture_dataset.csv")  # Agricultural data
+registry.register(
+    "agriculture_df", partial(pd.read_csv, "data/aggriculture_dataset.csv")
+)  # Agricultural data
+
+registry.register("district_data", partial(pd.read_csv, "data/output.csv"))
+
+# Precomputed recommendations from `python -m app.batch_scoring`, if current
+registry.register(
+    "data_version", partial(content_fingerprint, SOURCE_FILES, SCORING_VERSION)
+)
+
+
+@registry.loader("recommendation_table")
+def load_recommendation_table():
+    from app.recommendation_table import RecommendationTable
+
+    return RecommendationTable.load(
+        "data/recommendations.npz", registry.get("data_version")
+    )
 
-district_data = pd.read_csv("data/output.csv")
 
-# Initialize Groq client
-from groq import Groq
+# Initialize the Groq client. GROQ_BASE_URL can point it at a local stub
+# server (see tools/stub_chat_server.py).
+@registry.loader("async_client")
+def load_async_client():
+    from groq import AsyncGroq
 
-client = Groq(api_key="your_groq_api_key_here")
\ No newline at end of file
+    return AsyncGroq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL)
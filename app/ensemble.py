@@ -0,0 +1,126 @@
+# app/ensemble.py
+import logging
+import numpy as np
+import tensorflow as tf
+from app.data_loading import (
+    x_store_1,
+    x_store_2,
+    x_store_1_ins,
+    x_store_2_ins,
+    final_df,
+    model_1,
+    model_2,
+    model_1_ins,
+    model_2_ins,
+)
+from app.utils import build_ensemble_inputs, predict_ensemble
+
+logger = logging.getLogger(__name__)
+
+
+def _input_specs(model1, model2):
+    shapes = [model1.input_shape, *model2.input_shape]
+    return [tf.TensorSpec((None, *shape[1:]), tf.float32) for shape in shapes]
+
+
+class FusedEnsemble:
+    """
+    The scheme and insurance ensembles traced into one TensorFlow function.
+
+    Takes the model_1 input and the three model_2 inputs of both pipelines
+    (see build_ensemble_inputs) and returns the blended scheme and insurance
+    predictions, so a request costs one compiled call instead of four
+    `predict` calls.
+    """
+
+    def __init__(self, model1, model2, model1_ins, model2_ins, weights=(0.7, 0.3)):
+        w1, w2 = weights
+        input_signature = _input_specs(model1, model2) + _input_specs(
+            model1_ins, model2_ins
+        )
+
+        @tf.function(input_signature=input_signature)
+        def fused(
+            x1,
+            x2_main,
+            x2_neighbor,
+            x2_lstm,
+            x1_ins,
+            x2_main_ins,
+            x2_neighbor_ins,
+            x2_lstm_ins,
+        ):
+            schemes = w1 * model1(x1, training=False) + w2 * model2(
+                [x2_main, x2_neighbor, x2_lstm], training=False
+            )
+            insurances = w1 * model1_ins(x1_ins, training=False) + w2 * model2_ins(
+                [x2_main_ins, x2_neighbor_ins, x2_lstm_ins], training=False
+            )
+            return schemes, insurances
+
+        self._fused = fused
+
+    def predict(self, scheme_inputs, insurance_inputs):
+        tensors = [
+            tf.convert_to_tensor(np.asarray(x, dtype=np.float32))
+            for x in (*scheme_inputs, *insurance_inputs)
+        ]
+        schemes, insurances = self._fused(*tensors)
+        return schemes.numpy(), insurances.numpy()
+
+
+def check_parity(fused_ensemble, post_office_names, months=23):
+    """
+    Returns the largest absolute difference between the fused ensemble and
+    predict_ensemble over the given post offices.
+    """
+    schemes, insurances = fused_ensemble.predict(
+        build_ensemble_inputs(
+            post_office_names, x_store_1, x_store_2, final_df, months
+        ),
+        build_ensemble_inputs(
+            post_office_names, x_store_1_ins, x_store_2_ins, final_df, months
+        ),
+    )
+    expected_schemes = predict_ensemble(
+        post_office_names, model_1, model_2, x_store_1, x_store_2, final_df, months
+    )
+    expected_insurances = predict_ensemble(
+        post_office_names,
+        model_1_ins,
+        model_2_ins,
+        x_store_1_ins,
+        x_store_2_ins,
+        final_df,
+        months,
+    )
+    return max(
+        float(np.max(np.abs(schemes - expected_schemes))),
+        float(np.max(np.abs(insurances - expected_insurances))),
+    )
+
+
+def load_fused_ensemble(sample_size=16, atol=1e-4, months=23):
+    """
+    Builds the fused ensemble and checks it against the eager models on a
+    sample of post offices. Returns None if the outputs do not match.
+    """
+    fused_ensemble = FusedEnsemble(model_1, model_2, model_1_ins, model_2_ins)
+
+    sample = [
+        name
+        for name in final_df["Post Office Name"]
+        if x_store_1.has_window(name, months)
+        and x_store_2.has_window(name, months)
+        and x_store_1_ins.has_window(name, months)
+        and x_store_2_ins.has_window(name, months)
+    ][:sample_size]
+    if sample:
+        difference = check_parity(fused_ensemble, sample, months)
+        if difference > atol:
+            logger.warning(
+                "Fused ensemble disabled: differs from the eager models by %.3g",
+                difference,
+            )
+            return None
+    return fused_ensemble
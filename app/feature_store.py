@@ -0,0 +1,91 @@
+# app/feature_store.py
+import numpy as np
+
+
+class FeatureStore:
+    """
+    Per-post-office (month x feature) windows of a monthly feature frame.
+
+    The frame is sorted once and packed into a contiguous
+    (post office id x month x feature) array, with rows numbered by the shared
+    PostOfficeIndex, so that looking up the history of a post office is a
+    dictionary hit followed by an array slice.
+    """
+
+    def __init__(
+        self, df, numeric_cols, po_index, name_col="Post Office Name", month_col="Month"
+    ):
+        self.numeric_cols = list(numeric_cols)
+        self.po_index = po_index
+
+        df = df.sort_values([name_col, month_col], kind="stable")
+        ids = df[name_col].map(po_index.ids)
+        known = ids.notna().to_numpy()
+        ids = ids[known].to_numpy(dtype=np.int64)
+        positions = df.groupby(name_col, sort=False).cumcount().to_numpy()[known]
+        values = df[self.numeric_cols].to_numpy(dtype=np.float32)[known]
+
+        self.lengths = np.bincount(ids, minlength=len(po_index))
+        self.tensor = np.full(
+            (len(po_index), self.lengths.max() if len(ids) else 0, len(self.numeric_cols)),
+            np.nan,
+            dtype=np.float32,
+        )
+        self.tensor[ids, positions] = values
+
+    def __contains__(self, post_office_name):
+        row = self.po_index.get(post_office_name)
+        return row is not None and self.lengths[row] > 0
+
+    def has_window(self, post_office_name, months):
+        row = self.po_index.get(post_office_name)
+        return row is not None and self.lengths[row] >= months
+
+    def window(self, post_office_name, months=23):
+        """
+        Returns the first `months` months of features for a post office.
+        """
+        row = self.po_index.get(post_office_name)
+        if row is None or self.lengths[row] < months:
+            raise ValueError("Not enough data for this post office.")
+        return self.tensor[row, :months]
+
+    def windows(self, post_office_names, months=23):
+        """
+        Returns the stacked windows of every post office that has at least
+        `months` months of data, skipping the others.
+        """
+        rows = [
+            self.po_index.ids[name]
+            for name in post_office_names
+            if self.has_window(name, months)
+        ]
+        return self.tensor[rows, :months]
+
+
+class PastRecordStore:
+    """
+    Latest enrollment of every post office per scheme, packed into a
+    (post office id x scheme) matrix with the schemes in model output order.
+    """
+
+    def __init__(self, past_records, schemes, po_index, value_col="Month_24"):
+        self.schemes = list(schemes)
+        self.po_index = po_index
+
+        table = (
+            past_records.drop_duplicates(["Post Office Name", "Scheme"])
+            .pivot(index="Post Office Name", columns="Scheme", values=value_col)
+            .reindex(columns=self.schemes)
+        )
+        self.present = np.isin(po_index.names, table.index)
+        self.matrix = table.reindex(po_index.names).to_numpy(dtype=np.float64)
+
+    def __contains__(self, post_office_name):
+        row = self.po_index.get(post_office_name)
+        return row is not None and self.present[row]
+
+    def records(self, post_office_name):
+        if post_office_name not in self:
+            raise ValueError("No past scheme records for this post office.")
+        return self.matrix[self.po_index.ids[post_office_name]]
@@ -1,25 +1,201 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException
-from app.models import PredictionRequest, PlanRequest, TrendsRequest
-from app.data_loading import (
-    x_df,
-    x_df_ins,
-    final_df,
-    model_1,
-    model_2,
-    model_1_ins,
-    model_2_ins,
-    numeric_cols_1,
-    numeric_cols_2,
-    numeric_cols_1_ins,
-    numeric_cols_2_ins,
-    district_data,
+import asyncio
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+
+_import_started = time.perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from app.models import (
+    BulkPredictionRequest,
+    PredictionRequest,
+    PlanRequest,
+    TrendsRequest,
 )
+from app import data_loading
 from app.projections import calculate_projections
-from app.utils import collate_predictions, get_demographics
-from app.promotion_plan import collate_and_generate_plan
+from app.batching import MicroBatcher
+from app.result_cache import ResultCache, SharedResultStore
+from app.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Micro-batching of concurrent model calls
+MICRO_BATCHING = os.environ.get("MICRO_BATCHING", "1") == "1"
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "64"))
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "5"))
+
+# Scheme and insurance ensembles fused into one compiled call, built during
+# warm-up
+FUSED_ENSEMBLE = os.environ.get("FUSED_ENSEMBLE", "0") == "1"
+
+fused_ensemble = None
+
+# Load every resource in the background at startup; /health/ready reports
+# when it is done. With WARM_UP=0 resources load on first use only.
+WARM_UP = os.environ.get("WARM_UP", "1") == "1"
+
+# Modules whose import builds the scoring tables from the loaded data
+PIPELINE_MODULES = ["app.nbf_functions", "app.utils", "app.promotion_plan"]
+
+startup = {
+    "import_seconds": None,
+    "warm_up_seconds": None,
+    "module_seconds": {},
+    "ready": not WARM_UP,
+    "error": None,
+}
+
+# Serialized /predict_schemes and /demographics responses, per data version
+# and month; RESULT_CACHE_PATH shares them between workers, in a file of at
+# most RESULT_CACHE_SHARED_MAX_MB of responses
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", "64"))
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "")
+RESULT_CACHE_SHARED_MAX_MB = float(os.environ.get("RESULT_CACHE_SHARED_MAX_MB", "256"))
+
+result_cache = (
+    ResultCache(
+        int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+        SharedResultStore(
+            RESULT_CACHE_PATH, int(RESULT_CACHE_SHARED_MAX_MB * 1024 * 1024)
+        )
+        if RESULT_CACHE_PATH
+        else None,
+    )
+    if RESULT_CACHE_MAX_MB > 0
+    else None
+)
+
+
+def cache_generation():
+    return data_loading.data_version, datetime.now().month
+
+
+def serialize(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def json_response(body):
+    return Response(content=body, media_type="application/json")
+
+
+# Identical in-flight predictions and promotion plans are computed once
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "1") == "1"
+prediction_flight = SingleFlight(SINGLE_FLIGHT)
+plan_flight = SingleFlight(SINGLE_FLIGHT)
+
+# Post offices scored per chunk by /predict_schemes/bulk
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "256"))
+
+# Runs the insurance pipeline of a request while the request's own thread runs
+# the scheme pipeline; as large as anyio's default thread limit, so that it
+# does not cap the requests in flight
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", "40"))
+pipeline_executor = ThreadPoolExecutor(
+    max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline"
+)
+
+MODEL_NAMES = ["model_1", "model_2", "model_1_ins", "model_2_ins"]
+batchers = {}
+batchers_lock = threading.Lock()
+
+
+def get_batcher(name):
+    """
+    The MicroBatcher of a model, created on first use. The model itself loads
+    on the first batch.
+    """
+    with batchers_lock:
+        if name not in batchers:
+            batchers[name] = MicroBatcher(
+                partial(getattr, data_loading, name),
+                BATCH_MAX_SIZE,
+                BATCH_WINDOW_MS / 1000,
+            )
+        return batchers[name]
+
+
+def warm_up():
+    """
+    Loads every resource and imports the pipeline modules, timing each.
+    """
+    global fused_ensemble
+
+    start = time.perf_counter()
+    data_loading.registry.load_all()
+    for module in PIPELINE_MODULES:
+        module_start = time.perf_counter()
+        importlib.import_module(module)
+        startup["module_seconds"][module] = round(
+            time.perf_counter() - module_start, 4
+        )
+    for name in MODEL_NAMES:
+        get_batcher(name)
+    if FUSED_ENSEMBLE:
+        from app.ensemble import load_fused_ensemble
+
+        fused_ensemble = load_fused_ensemble()
+    startup["warm_up_seconds"] = round(time.perf_counter() - start, 4)
+
+
+async def warm_up_in_background():
+    try:
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        startup["error"] = repr(e)
+        return
+    if MICRO_BATCHING:
+        for batcher in batchers.values():
+            batcher.start()
+    startup["ready"] = True
+    logger.info("Ready: %s", json.dumps(startup_report()))
+
+
+def startup_report():
+    return {**startup, "resources": data_loading.registry.report()}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warm_up_task = None
+    if WARM_UP:
+        warm_up_task = asyncio.create_task(warm_up_in_background())
+    elif MICRO_BATCHING:
+        for name in MODEL_NAMES:
+            get_batcher(name).start()
+    yield
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    for batcher in batchers.values():
+        await batcher.stop()
+    pipeline_executor.shutdown(wait=False)
+
+
+app = FastAPI(title="Post Office Scheme Recommendation API", lifespan=lifespan)
+
+
+@app.get("/health/live")
+def health_live():
+    return {"status": "alive"}
+
 
-app = FastAPI(title="Post Office Scheme Recommendation API")
+@app.get("/health/ready")
+def health_ready():
+    report = startup_report()
+    if not startup["ready"]:
+        return JSONResponse(report, status_code=503)
+    return report
 
 
 @app.get("/")
@@ -42,7 +218,9 @@ def plot_district_trends(request: TrendsRequest):
     }
 
     try:
-        projections = calculate_projections(district_name, district_data, growth_rates)
+        projections = calculate_projections(
+            district_name, data_loading.district_data, growth_rates
+        )
         return {
             "district_name": district_name,
             "projections": {
@@ -62,86 +240,346 @@ def plot_district_trends(request: TrendsRequest):
         )
 
 
+def recommend(post_office_name, include_neighbor_vote, current_month):
+    """
+    Returns the recommended schemes and insurances of a post office.
+    """
+    from app.utils import RequestContext, collate_predictions, predict_fused_ensemble
+
+    # Resolve the PO, its neighbors and demographics once for both pipelines
+    context = RequestContext(
+        post_office_name, data_loading.final_df, include_neighbor_vote, current_month
+    )
+
+    ensemble_preds = ensemble_preds_ins = None
+    # The fused graph only pays off when scoring live
+    if fused_ensemble is not None and data_loading.recommendation_table is None:
+        ensemble_preds, ensemble_preds_ins = predict_fused_ensemble(
+            context.post_office_names,
+            fused_ensemble,
+            data_loading.x_store_1,
+            data_loading.x_store_2,
+            data_loading.x_store_1_ins,
+            data_loading.x_store_2_ins,
+            data_loading.final_df,
+            context=context,
+        )
+
+    insurances_future = pipeline_executor.submit(
+        collate_predictions,
+        post_office_name,
+        get_batcher("model_1_ins"),
+        get_batcher("model_2_ins"),
+        data_loading.x_store_1_ins,
+        data_loading.x_store_2_ins,
+        data_loading.final_df,
+        months=23,
+        month_offset=1,
+        top_n_schemes=1,
+        include_neighbor_vote=include_neighbor_vote,
+        is_insurance=True,
+        ensemble_preds=ensemble_preds_ins,
+        context=context,
+    )
+    schemes = collate_predictions(
+        post_office_name,
+        get_batcher("model_1"),
+        get_batcher("model_2"),
+        data_loading.x_store_1,
+        data_loading.x_store_2,
+        data_loading.final_df,
+        months=23,
+        month_offset=1,
+        top_n_schemes=2,
+        include_neighbor_vote=include_neighbor_vote,
+        ensemble_preds=ensemble_preds,
+        context=context,
+    )
+    return schemes, insurances_future.result()
+
+
 @app.post("/predict_schemes")
 def predict_schemes(request: PredictionRequest):
     post_office_name = request.post_office_name
     top_n_schemes = request.top_n_schemes
     include_neighbor_vote = request.include_neighbor_vote
 
-    if post_office_name not in final_df["Post Office Name"].values:
+    if post_office_name not in data_loading.po_index:
         raise HTTPException(status_code=404, detail="Post Office not found.")
 
+    generation = cache_generation()
+    # The response is always the top 2 schemes and top insurance, whatever
+    # top_n_schemes the request asks for
+    cache_key = ("predict_schemes", post_office_name, include_neighbor_vote)
+    if result_cache is not None:
+        cached = result_cache.get(cache_key, generation)
+        if cached is not None:
+            return json_response(cached)
+
     try:
-        schemes = collate_predictions(
+        # Identical requests in flight share one computation
+        schemes, insurances = prediction_flight.run(
+            ("recommend", post_office_name, include_neighbor_vote, generation),
+            recommend,
             post_office_name,
-            model_1,
-            model_2,
-            x_df,
-            final_df,
-            numeric_cols_1,
-            numeric_cols_2,
-            months=23,
-            month_offset=1,
-            top_n_schemes=2,
-            include_neighbor_vote=include_neighbor_vote,
+            include_neighbor_vote,
+            generation[1],
         )
-        insurances = collate_predictions(
-            post_office_name,
-            model_1_ins,
-            model_2_ins,
-            x_df_ins,
-            final_df,
-            numeric_cols_1_ins,
-            numeric_cols_2_ins,
-            months=23,
-            month_offset=1,
-            top_n_schemes=1,
-            include_neighbor_vote=include_neighbor_vote,
-            is_insurance=True,
-        )
-        return {
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    content = serialize(
+        {
             "post_office_name": post_office_name,
             "recommended_schemes": schemes,
             "recommended_insurances": insurances,
         }
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    )
+    if result_cache is not None:
+        result_cache.put(cache_key, generation, content)
+    return json_response(content)
+
+
+def resolve_bulk_names(request):
+    selectors = [
+        request.post_office_names is not None,
+        request.district_name is not None,
+        request.cluster_label is not None,
+    ]
+    if sum(selectors) != 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Give exactly one of post_office_names, district_name or cluster_label.",
+        )
+    if request.post_office_names is not None:
+        names = request.post_office_names
+    elif request.district_name is not None:
+        demographics_df = data_loading.demographics_df
+        names = demographics_df.loc[
+            demographics_df["District"] == request.district_name, "Post Office Name"
+        ]
+    else:
+        final_df = data_loading.final_df
+        names = final_df.loc[
+            final_df["cluster_label"] == request.cluster_label, "Post Office Name"
+        ]
+    return list(dict.fromkeys(names))
+
+
+@app.post("/predict_schemes/bulk")
+def predict_schemes_bulk(request: BulkPredictionRequest):
+    """
+    Streams the /predict_schemes result of every selected post office as one
+    JSON object per line, in chunks of BULK_CHUNK_SIZE.
+    """
+    from app.utils import collate_predictions_bulk
+
+    names = resolve_bulk_names(request)
+    known = [name for name in names if name in data_loading.po_index]
+
+    def pipeline(models, stores, top_n_schemes, is_insurance):
+        return collate_predictions_bulk(
+            known,
+            *models,
+            *stores,
+            data_loading.final_df,
+            months=23,
+            top_n_schemes=top_n_schemes,
+            include_neighbor_vote=request.include_neighbor_vote,
+            is_insurance=is_insurance,
+            chunk_size=BULK_CHUNK_SIZE,
+        )
+
+    def lines():
+        for name in names:
+            if name not in data_loading.po_index:
+                yield json.dumps(
+                    {"post_office_name": name, "error": "Post Office not found."}
+                ) + "\n"
+        results = zip(
+            pipeline(
+                (data_loading.model_1, data_loading.model_2),
+                (data_loading.x_store_1, data_loading.x_store_2),
+                2,
+                False,
+            ),
+            pipeline(
+                (data_loading.model_1_ins, data_loading.model_2_ins),
+                (data_loading.x_store_1_ins, data_loading.x_store_2_ins),
+                1,
+                True,
+            ),
+        )
+        for (name, schemes), (_, insurances) in results:
+            error = next(
+                (r for r in (schemes, insurances) if isinstance(r, ValueError)), None
+            )
+            if error is not None:
+                line = {"post_office_name": name, "error": str(error)}
+            else:
+                line = {
+                    "post_office_name": name,
+                    "recommended_schemes": schemes,
+                    "recommended_insurances": insurances,
+                }
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def plan_pipeline(post_office_name):
+    """
+    Returns the cache generation, batchers and stores the promotion plan
+    endpoints score with, importing the pipeline and loading them if need be,
+    so call it off the event loop. Raises a 404 for unknown post offices.
+    """
+    importlib.import_module("app.promotion_plan")
+    if post_office_name not in data_loading.po_index:
+        raise HTTPException(status_code=404, detail="Post Office not found.")
+    return (
+        cache_generation(),
+        get_batcher("model_1"),
+        get_batcher("model_2"),
+        data_loading.x_store_1,
+        data_loading.x_store_2,
+        data_loading.final_df,
+    )
 
 
 @app.post("/promotion_plans")
-def get_promotion_plans(request: PlanRequest):
+async def get_promotion_plans(request: PlanRequest):
     post_office_name = request.post_office_name
     top_n_schemes = request.top_n_schemes
     include_neighbor_vote = request.include_neighbor_vote
 
-    if post_office_name not in final_df["Post Office Name"].values:
-        raise HTTPException(status_code=404, detail="Post Office not found.")
+    generation, *pipeline = await asyncio.to_thread(plan_pipeline, post_office_name)
+    from app.promotion_plan import collate_and_generate_plan
 
     try:
-        plans = collate_and_generate_plan(
+        plans, failed_schemes = await plan_flight.run_async(
+            (post_office_name, top_n_schemes, include_neighbor_vote, generation),
+            collate_and_generate_plan,
             post_office_name,
-            model_1,
-            model_2,
-            x_df,
-            final_df,
-            numeric_cols_1,
-            numeric_cols_2,
+            *pipeline,
             months=23,
             month_offset=1,
             top_n_schemes=top_n_schemes,
             include_neighbor_vote=include_neighbor_vote,
         )
+        if failed_schemes and not plans:
+            raise HTTPException(
+                status_code=502, detail="Promotion plan generation failed."
+            )
         return {
             "post_office_name": post_office_name,
             "promotion_plans": [p.dict() for p in plans],
+            "failed_schemes": failed_schemes,
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/promotion_plans/stream")
+async def stream_promotion_plans_endpoint(request: PlanRequest):
+    """
+    Server-sent events variant of /promotion_plans: a "recommendations" event
+    with the top schemes as soon as they are known, then the plan of each
+    scheme streamed as it is generated.
+    """
+    post_office_name = request.post_office_name
+
+    generation, *pipeline = await asyncio.to_thread(plan_pipeline, post_office_name)
+    from app.promotion_plan import format_sse, stream_promotion_plans
+    from app.utils import collate_predictions, get_demographics
+
+    try:
+        top_schemes = await asyncio.to_thread(
+            prediction_flight.run,
+            (
+                "top_schemes",
+                post_office_name,
+                request.top_n_schemes,
+                request.include_neighbor_vote,
+                generation,
+            ),
+            collate_predictions,
+            post_office_name,
+            *pipeline,
+            months=23,
+            month_offset=1,
+            top_n_schemes=request.top_n_schemes,
+            include_neighbor_vote=request.include_neighbor_vote,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    demographics_data = get_demographics(post_office_name)
+
+    async def events():
+        yield format_sse(
+            "recommendations",
+            {"post_office_name": post_office_name, "schemes": top_schemes},
+        )
+        async for event, data in stream_promotion_plans(top_schemes, demographics_data):
+            yield format_sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/demographics/{post_office_name}")
 def get_po_demographics(post_office_name: str):
-    if post_office_name not in final_df["Post Office Name"].values:
+    from app.utils import get_demographics
+
+    if post_office_name not in data_loading.po_index:
         raise HTTPException(status_code=404, detail="Post Office not found.")
+
+    generation = cache_generation()
+    cache_key = ("demographics", post_office_name)
+    if result_cache is not None:
+        cached = result_cache.get(cache_key, generation)
+        if cached is not None:
+            return json_response(cached)
+
     data = get_demographics(post_office_name)
-    return data.to_dict(orient="records")
\ No newline at end of file
+    content = serialize(data.to_dict(orient="records"))
+    if result_cache is not None:
+        result_cache.put(cache_key, generation, content)
+    return json_response(content)
+
+
+@app.get("/post_offices/search")
+def search_post_offices(q: str = Query(..., max_length=100), limit: int = 10):
+    matches = data_loading.po_index.suggest(q, max(1, min(limit, 100)))
+    return {"query": q, "matches": matches}
+
+
+@app.get("/stats/batching")
+def get_batching_stats():
+    return {name: batcher.stats() for name, batcher in batchers.items()}
+
+
+@app.get("/stats/result_cache")
+def get_result_cache_stats():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@app.get("/stats/single_flight")
+def get_single_flight_stats():
+    return {"predictions": prediction_flight.stats(), "plans": plan_flight.stats()}
+
+
+@app.get("/stats/plan_cache")
+def get_plan_cache_stats():
+    from app.promotion_plan import plan_cache
+
+    if plan_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **plan_cache.stats()}
+
+
+startup["import_seconds"] = round(time.perf_counter() - _import_started, 4)
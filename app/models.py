@@ -1,4 +1,5 @@
 # app/models.py
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -13,6 +14,13 @@ class PredictionRequest(BaseModel):
     include_neighbor_vote: bool = False
 
 
+class BulkPredictionRequest(BaseModel):
+    post_office_names: Optional[List[str]] = None
+    district_name: Optional[str] = None
+    cluster_label: Optional[int] = None
+    include_neighbor_vote: bool = False
+
+
 class PlanRequest(BaseModel):
     post_office_name: str
     top_n_schemes: int = 3
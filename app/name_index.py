@@ -0,0 +1,78 @@
+# app/name_index.py
+import bisect
+import difflib
+import numpy as np
+
+# Shorter queries get prefix matches only
+MIN_FUZZY_LENGTH = 3
+
+
+class PostOfficeIndex:
+    """
+    Maps post office names to integer ids, the position of their first row in
+    `final_df`, which the other stores use as their row numbers.
+
+    Also keeps the names sorted case-insensitively for prefix search, with a
+    fuzzy fallback for misspelled names.
+    """
+
+    def __init__(self, names):
+        self.names = np.asarray(names, dtype=object)
+        self.ids = {}
+        for position, name in enumerate(self.names):
+            self.ids.setdefault(name, position)
+
+        sorted_names = sorted(
+            (name.casefold(), name) for name in self.ids if isinstance(name, str)
+        )
+        self._keys = [key for key, _ in sorted_names]
+        self._sorted_names = [name for _, name in sorted_names]
+        # Fuzzy candidates, by first character
+        self._buckets = {}
+        for key in self._keys:
+            self._buckets.setdefault(key[:1], []).append(key)
+
+    def __contains__(self, post_office_name):
+        return post_office_name in self.ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, post_office_name, default=None):
+        return self.ids.get(post_office_name, default)
+
+    def search(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, ignoring case, in
+        alphabetical order.
+        """
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self._keys, prefix)
+        matches = []
+        for key, name in zip(self._keys[start:], self._sorted_names[start:]):
+            if not key.startswith(prefix) or len(matches) == limit:
+                break
+            matches.append(name)
+        return matches
+
+    def fuzzy(self, query, limit=10, cutoff=0.6):
+        """
+        Returns up to `limit` names closest to `query` among those starting
+        with the same character, best first.
+        """
+        query = query.casefold()
+        candidates = self._buckets.get(query[:1], [])
+        keys = difflib.get_close_matches(query, candidates, limit, cutoff)
+        return [self._sorted_names[bisect.bisect_left(self._keys, key)] for key in keys]
+
+    def suggest(self, query, limit=10):
+        """
+        Prefix matches for `query`, or fuzzy matches if there are none and the
+        query has at least MIN_FUZZY_LENGTH characters. The fuzzy pass compares
+        the query with every name of its first letter, so it is kept for
+        misspelled queries rather than run on every short result list.
+        """
+        matches = self.search(query, limit)
+        if not matches and len(query) >= MIN_FUZZY_LENGTH:
+            matches = self.fuzzy(query, limit)
+        return matches
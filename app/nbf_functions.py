@@ -1,6 +1,7 @@
 # app/nbf_functions.py
+import numpy as np
 import pandas as pd
-from app.data_loading import demographics_df, agriculture_df
+from app.data_loading import demographics_df, agriculture_df, po_index
 
 # SCHEME_WEIGHTS as in the original code
 SCHEME_WEIGHTS = {
@@ -381,65 +382,195 @@ SCHEME_WEIGHTS_INSURANCE = {
 
 
 
-def calculate_demographic_weight(post_office_name, scheme_name, is_insurance=False):
-    po_data = demographics_df[demographics_df["Post Office Name"] == post_office_name]
-    weights = (
-        SCHEME_WEIGHTS.get(scheme_name, {})
-        if not is_insurance
-        else SCHEME_WEIGHTS_INSURANCE.get(scheme_name, {})
+# Demographic dimensions of the weight dictionaries and their source columns
+SEGMENT_COLUMNS = {
+    "age_group": "Age Group",
+    "gender": "Gender",
+    "occupation": "Occupation",
+    "income": "Income Level",
+}
+
+
+def encode_demographic_segments(demographics_df, po_index):
+    """
+    Sums the population of every post office per demographic segment.
+
+    Returns, with rows numbered by the PostOfficeIndex, whether each post
+    office has demographics and its district, the list of (dimension, value)
+    segment keys, and the matching (post office id x segment) population
+    matrix.
+    """
+    districts = demographics_df.drop_duplicates("Post Office Name").set_index(
+        "Post Office Name"
+    )["District"]
+    has_rows = np.isin(po_index.names, districts.index)
+    po_districts = districts.reindex(po_index.names)
+
+    segments = []
+    blocks = []
+    for dimension, column in SEGMENT_COLUMNS.items():
+        values = demographics_df[column]
+        if dimension == "income":
+            values = values.astype(str)
+        population = (
+            demographics_df["Population"]
+            .groupby([demographics_df["Post Office Name"], values])
+            .sum()
+            .unstack(fill_value=0)
+            .reindex(po_index.names, fill_value=0)
+        )
+        segments += [(dimension, value) for value in population.columns]
+        blocks.append(population.to_numpy(dtype=np.float64))
+
+    # A missing population makes every score of its post office NaN, as
+    # summing the rows one by one does
+    missing = (
+        demographics_df["Population"]
+        .isna()
+        .groupby(demographics_df["Post Office Name"])
+        .any()
+        .reindex(po_index.names, fill_value=False)
+        .to_numpy(dtype=bool)
     )
-    score = 0
+    matrix = np.hstack(blocks)
+    matrix[missing] = np.nan
+    return has_rows, po_districts, segments, matrix
+
+
+def compile_scheme_weights(scheme_weights, segments):
+    """
+    Turns a weight dictionary into a dense (scheme x segment) matrix.
+    """
+    scheme_names = list(scheme_weights.keys())
+    matrix = np.array(
+        [
+            [
+                scheme_weights[scheme_name].get(dimension, {}).get(value, 0)
+                for dimension, value in segments
+            ]
+            for scheme_name in scheme_names
+        ],
+        dtype=np.float64,
+    ).reshape(len(scheme_names), len(segments))
+    return scheme_names, matrix
+
+
+(
+    po_has_demographics,
+    po_districts,
+    demographic_segments,
+    segment_population,
+) = encode_demographic_segments(demographics_df, po_index)
+compiled_scheme_weights = {
+    False: compile_scheme_weights(SCHEME_WEIGHTS, demographic_segments),
+    True: compile_scheme_weights(SCHEME_WEIGHTS_INSURANCE, demographic_segments),
+}
+
+
+def has_demographics(post_office_name):
+    row = po_index.get(post_office_name)
+    return row is not None and po_has_demographics[row]
+
+
+def calculate_demographic_weight(post_office_name, scheme_name, is_insurance=False):
+    if not has_demographics(post_office_name):
+        return 0
+    scheme_names, weight_matrix = compiled_scheme_weights[is_insurance]
+    if scheme_name not in scheme_names:
+        return 0
+    row = po_index.ids[post_office_name]
+    return segment_population[row] @ weight_matrix[scheme_names.index(scheme_name)]
 
-    for _, row in po_data.iterrows():
-        age_wt = weights.get("age_group", {}).get(row["Age Group"], 0)
-        gender_wt = weights.get("gender", {}).get(row["Gender"], 0)
-        occ_wt = weights.get("occupation", {}).get(row["Occupation"], 0)
-        income_wt = weights.get("income", {}).get(str(row["Income Level"]), 0)
 
-        # Contribution of each demographic segment
-        score += row["Population"] * (age_wt + gender_wt + occ_wt + income_wt)
-    return score
+def build_agriculture_calendar(agriculture_df):
+    """
+    Scores every district for each month of the year.
+
+    A crop adds the sowing weight in every month from sowing to harvesting and
+    the harvesting weight in its harvesting month. Seasons whose harvest falls
+    in the next year (e.g. Rabi, sown in 11 and harvested in 3) wrap around
+    December.
+    """
+    districts = pd.Index(agriculture_df["District"].unique())
+    calendar = np.zeros((len(districts), 12))
+    months = np.arange(1, 13)
+
+    for district, sowing, harvesting in zip(
+        agriculture_df["District"],
+        agriculture_df["Sowing Period Numeric"],
+        agriculture_df["Harvesting Period Numeric"],
+    ):
+        if pd.isna(sowing) or pd.isna(harvesting):
+            continue
+        if sowing <= harvesting:
+            sowing_active = (sowing <= months) & (months <= harvesting)
+        else:
+            sowing_active = (sowing <= months) | (months <= harvesting)
+        harvesting_active = months == harvesting
+
+        row = districts.get_loc(district)
+        calendar[row] += 0.6 * sowing_active  # Sowing weight
+        calendar[row] += 0.4 * harvesting_active  # Harvesting weight
+
+    return districts, calendar
+
+
+agriculture_districts, agriculture_calendar = build_agriculture_calendar(
+    agriculture_df
+)
 
 
 def calculate_agriculture_weight(district, current_month):
-    crop_data = agriculture_df[agriculture_df["District"] == district]
-    score = 0
-
-    for _, row in crop_data.iterrows():
-        sowing_active = (
-            row["Sowing Period Numeric"]
-            <= current_month
-            <= row["Harvesting Period Numeric"]
-        )
-        harvesting_active = current_month == row["Harvesting Period Numeric"]
-        if sowing_active:
-            score += 0.6  # Sowing weight
-        if harvesting_active:
-            score += 0.4  # Harvesting weight
-    return score
-
-
-def calculate_nbf(post_office_name, current_month, is_insurance=False):
-    nbf_scores = {}
-    po_data = demographics_df[demographics_df["Post Office Name"] == post_office_name]
-    if po_data.empty:
+    if district not in agriculture_districts:
+        return 0
+    row = agriculture_districts.get_loc(district)
+    return agriculture_calendar[row, current_month - 1]
+
+
+def find_demographics(post_office_name):
+    """
+    Returns the row of a post office in the segment population matrix and its
+    district.
+    """
+    if not has_demographics(post_office_name):
         raise ValueError("Post office not found in demographics data.")
-    district = po_data["District"].iloc[0]
+    row = po_index.ids[post_office_name]
+    return row, po_districts.iloc[row]
 
-    selected_scheme_weights = (
-        SCHEME_WEIGHTS if not is_insurance else SCHEME_WEIGHTS_INSURANCE
-    )
 
-    for scheme_name in selected_scheme_weights.keys():
-        # Calculate weights
-        demo_weight = calculate_demographic_weight(
-            post_office_name, scheme_name, is_insurance
-        )
-        agri_weight = calculate_agriculture_weight(district, current_month)
+def calculate_nbf(
+    post_office_name, current_month, is_insurance=False, demographics=None
+):
+    row, district = demographics or find_demographics(post_office_name)
+
+    scheme_names, weight_matrix = compiled_scheme_weights[is_insurance]
 
-        # Combine weights with coefficients
-        alpha, beta = 0.7, 0.3
-        nbf_scores[scheme_name] = alpha * demo_weight + beta * agri_weight
+    # Demographic weight of every scheme in one product
+    demo_weight = weight_matrix @ segment_population[row]
+    agri_weight = calculate_agriculture_weight(district, current_month)
+
+    # Combine weights with coefficients
+    alpha, beta = 0.7, 0.3
+    nbf_scores = alpha * demo_weight + beta * agri_weight
 
     # Return NBF scores as a Series
-    return pd.Series(nbf_scores)
+    return pd.Series(nbf_scores, index=scheme_names)
+
+
+def calculate_nbf_matrix(current_month, is_insurance=False):
+    """
+    Returns the NBF scores of every post office with demographics as a
+    (post office x scheme) DataFrame.
+    """
+    scheme_names, weight_matrix = compiled_scheme_weights[is_insurance]
+    demo_weight = segment_population[po_has_demographics] @ weight_matrix.T
+
+    districts = po_districts[po_has_demographics]
+    rows = agriculture_districts.get_indexer(districts)
+    agri_weight = np.where(
+        rows >= 0, agriculture_calendar[rows, current_month - 1], 0
+    )
+
+    alpha, beta = 0.7, 0.3
+    nbf_scores = alpha * demo_weight + beta * agri_weight[:, None]
+    return pd.DataFrame(nbf_scores, index=districts.index, columns=scheme_names)
@@ -0,0 +1,82 @@
+# app/neighbors.py
+import numpy as np
+from sklearn.neighbors import KDTree, NearestNeighbors
+
+
+class NeighborIndex:
+    """
+    Precomputed nearest neighbors of every post office within its cluster.
+
+    The top `n_neighbors` neighbors (positions into `final_df`) and their
+    euclidean distances are computed once for all post offices. A KD tree per
+    cluster is kept around to answer queries for a larger number of neighbors.
+    """
+
+    non_features = ["Post Office Name", "cluster_label"]
+
+    def __init__(self, final_df, po_index, n_neighbors=5):
+        self.n_neighbors = n_neighbors
+        self.po_index = po_index
+        self.names = po_index.names
+
+        features = (
+            final_df.drop(columns=self.non_features, errors="ignore")
+            .select_dtypes(include=[np.number])
+            .to_numpy(dtype=np.float64)
+        )
+        labels = final_df["cluster_label"].to_numpy()
+
+        self.neighbor_ids = np.full((len(final_df), n_neighbors), -1, dtype=np.int64)
+        self.neighbor_distances = np.full((len(final_df), n_neighbors), np.inf)
+        self.cluster_members = {}
+        self.cluster_trees = {}
+
+        for cluster_label in np.unique(labels):
+            members = np.flatnonzero(labels == cluster_label)
+            cluster_features = features[members]
+            self.cluster_members[cluster_label] = members
+            self.cluster_trees[cluster_label] = KDTree(cluster_features)
+
+            k = min(n_neighbors + 1, len(members))
+            knn = NearestNeighbors(n_neighbors=k, metric="euclidean")
+            knn.fit(cluster_features)
+            distances, indices = knn.kneighbors(cluster_features)
+            neighbor_ids = members[indices]
+
+            for row, position in enumerate(members):
+                ids, dists = self._drop_self(
+                    position, neighbor_ids[row], distances[row], n_neighbors
+                )
+                self.neighbor_ids[position, : len(ids)] = ids
+                self.neighbor_distances[position, : len(ids)] = dists
+
+        self.labels = labels
+        self.features = features
+
+    def _drop_self(self, position, ids, distances, n_neighbors):
+        mask = self.names[ids] != self.names[position]
+        return ids[mask][:n_neighbors], distances[mask][:n_neighbors]
+
+    def query(self, post_office_name, n_neighbors=None):
+        """
+        Returns the positions and distances of the nearest neighbors of a post
+        office within its cluster, closest first.
+        """
+        n_neighbors = self.n_neighbors if n_neighbors is None else n_neighbors
+        position = self.po_index.get(post_office_name)
+        if position is None:
+            raise ValueError("Post office not found.")
+
+        if n_neighbors <= self.n_neighbors:
+            ids = self.neighbor_ids[position, :n_neighbors]
+            distances = self.neighbor_distances[position, :n_neighbors]
+            found = ids >= 0
+            return ids[found], distances[found]
+
+        cluster_label = self.labels[position]
+        members = self.cluster_members[cluster_label]
+        k = min(n_neighbors + 1, len(members))
+        distances, indices = self.cluster_trees[cluster_label].query(
+            self.features[position : position + 1], k=k
+        )
+        return self._drop_self(position, members[indices[0]], distances[0], n_neighbors)
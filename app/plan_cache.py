@@ -0,0 +1,119 @@
+# app/plan_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+
+def demographics_fingerprint(demographics_data, digits=2):
+    """
+    Normalizes a post office's demographics so that offices with nearly the
+    same profile share a fingerprint: the name is dropped and every number is
+    rounded to `digits` significant digits.
+    """
+    record = demographics_data.drop(columns=["Post Office Name"], errors="ignore")
+    parts = []
+    for column, value in record.iloc[0].items():
+        if isinstance(value, (int, float, np.number)) and not pd.isna(value):
+            value = float(f"{float(value):.{digits}g}")
+        parts.append(f"{column}={value}")
+    return "|".join(parts)
+
+
+def plan_cache_key(scheme_name, scheme_details, demographics_data):
+    payload = json.dumps(
+        [scheme_name, scheme_details, demographics_fingerprint(demographics_data)],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PlanCache:
+    """
+    On-disk cache of generated promotion plans, keyed by plan_cache_key.
+
+    Entries expire `ttl` seconds after they were written and the least
+    recently used ones are evicted beyond `max_entries`. The SQLite file can
+    be shared by several worker processes.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                key TEXT PRIMARY KEY,
+                scheme_name TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS plans_accessed_at ON plans (accessed_at)"
+        )
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT plan, created_at FROM plans WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE plans SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, scheme_name, plan):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?)",
+                (key, scheme_name, plan, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM plans WHERE created_at < ?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                """
+                DELETE FROM plans WHERE key IN (
+                    SELECT key FROM plans ORDER BY accessed_at LIMIT ?
+                )
+                """,
+                (count - self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,10 +1,34 @@
-from app.data_loading import client, post_office_schemes, final_df
+import argparse
+import asyncio
+import json
+import logging
+import os
+from contextlib import aclosing
+from app.data_loading import async_client, post_office_schemes, final_df
 from app.models import PromotionPlan
+from app.plan_cache import PlanCache, plan_cache_key
 from app.utils import collate_predictions, get_demographics
 import pandas as pd
 
+logger = logging.getLogger(__name__)
 
-def generate_promotion_plan(scheme_name, scheme_details, demographics_data):
+# Bounds for the concurrent plan generation of one request
+PLAN_CONCURRENCY = int(os.environ.get("PLAN_CONCURRENCY", "4"))
+PLAN_TIMEOUT = float(os.environ.get("PLAN_TIMEOUT", "60"))
+
+# Generated plans are cached on disk; an empty PLAN_CACHE_PATH disables it
+PLAN_CACHE_PATH = os.environ.get("PLAN_CACHE_PATH", "data/plan_cache.sqlite3")
+PLAN_CACHE_TTL = float(os.environ.get("PLAN_CACHE_TTL", str(7 * 24 * 3600)))
+PLAN_CACHE_MAX_ENTRIES = int(os.environ.get("PLAN_CACHE_MAX_ENTRIES", "10000"))
+
+plan_cache = (
+    PlanCache(PLAN_CACHE_PATH, PLAN_CACHE_TTL, PLAN_CACHE_MAX_ENTRIES)
+    if PLAN_CACHE_PATH
+    else None
+)
+
+
+def build_plan_messages(scheme_name, scheme_details, demographics_data):
     user_message = f"""
     Scheme Name: {scheme_name}
 
@@ -33,53 +57,283 @@ def generate_promotion_plan(scheme_name, scheme_details, demographics_data):
     5. **Key Metrics**: How success will be measured (e.g., number of enrollments, awareness levels, feedback).
     """
 
-    completion = client.chat.completions.create(
-        model="llama-3.1-70b-versatile",
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message},
-        ],
-        temperature=1,
-        max_tokens=1024,
-        top_p=1,
-        stream=False,
-        stop=None,
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def completion_request(scheme_name, scheme_details, demographics_data, stream=False):
+    """
+    Returns the arguments of the chat completion generating a plan.
+    """
+    return {
+        "model": "llama-3.1-70b-versatile",
+        "messages": build_plan_messages(scheme_name, scheme_details, demographics_data),
+        "temperature": 1,
+        "max_tokens": 1024,
+        "top_p": 1,
+        "stream": stream,
+        "stop": None,
+    }
+
+
+def get_cached_plan(scheme_name, scheme_details, demographics_data):
+    """
+    Returns the cache key of a plan and the cached plan, if any.
+    """
+    if plan_cache is None:
+        return None, None
+    key = plan_cache_key(scheme_name, scheme_details, demographics_data)
+    plan = plan_cache.get(key)
+    if plan is None:
+        return key, None
+    return key, PromotionPlan(scheme_name=scheme_name, plan=plan)
+
+
+async def generate_promotion_plan_async(scheme_name, scheme_details, demographics_data):
+    key, cached_plan = await asyncio.to_thread(
+        get_cached_plan, scheme_name, scheme_details, demographics_data
+    )
+    if cached_plan is not None:
+        return cached_plan
+
+    completion = await async_client.chat.completions.create(
+        **completion_request(scheme_name, scheme_details, demographics_data)
     )
 
     generated_plan = completion.choices[0].message.content
+    if key is not None:
+        await asyncio.to_thread(plan_cache.put, key, scheme_name, generated_plan)
     return PromotionPlan(scheme_name=scheme_name, plan=generated_plan)
 
 
-def collate_and_generate_plan(
+async def generate_promotion_plans(
+    schemes, demographics_data, concurrency=PLAN_CONCURRENCY, timeout=PLAN_TIMEOUT
+):
+    """
+    Generates the plans of all schemes concurrently, at most `concurrency` at
+    a time and each within `timeout` seconds. Returns the generated plans and
+    the names of the schemes whose generation failed.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(scheme):
+        async with semaphore:
+            return await asyncio.wait_for(
+                generate_promotion_plan_async(
+                    scheme, post_office_schemes[scheme], demographics_data
+                ),
+                timeout,
+            )
+
+    results = await asyncio.gather(
+        *(generate(scheme) for scheme in schemes), return_exceptions=True
+    )
+
+    plan_list, failed_schemes = [], []
+    for scheme, result in zip(schemes, results):
+        # Cancellation and the like are not failed plans
+        if isinstance(result, BaseException) and not isinstance(result, Exception):
+            raise result
+        if isinstance(result, Exception):
+            logger.warning("Promotion plan for %s failed: %r", scheme, result)
+            failed_schemes.append(scheme)
+        else:
+            plan_list.append(result)
+    return plan_list, failed_schemes
+
+
+async def stream_promotion_plan(scheme_name, scheme_details, demographics_data):
+    """
+    Yields the plan text as the completion streams in. A cached plan is
+    yielded whole.
+    """
+    key, cached_plan = await asyncio.to_thread(
+        get_cached_plan, scheme_name, scheme_details, demographics_data
+    )
+    if cached_plan is not None:
+        yield cached_plan.plan
+        return
+
+    stream = await async_client.chat.completions.create(
+        **completion_request(
+            scheme_name, scheme_details, demographics_data, stream=True
+        )
+    )
+    parts = []
+    # Closes the response on a timeout or cancellation too
+    async with stream:
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if content:
+                parts.append(content)
+                yield content
+
+    if key is not None:
+        await asyncio.to_thread(plan_cache.put, key, scheme_name, "".join(parts))
+
+
+async def stream_promotion_plans(
+    schemes, demographics_data, concurrency=PLAN_CONCURRENCY, timeout=PLAN_TIMEOUT
+):
+    """
+    Streams the plans of all schemes concurrently, yielding (event, data)
+    pairs as chunks arrive: "plan_chunk" for each piece of text, then
+    "plan_done" with the full plan or "plan_error" per scheme, and finally
+    "done" with the schemes that failed.
+    """
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def consume(scheme):
+        parts = []
+        # Finalizes the generator, and so its stream, even when cancelled
+        # between two chunks
+        chunks = stream_promotion_plan(
+            scheme, post_office_schemes[scheme], demographics_data
+        )
+        async with aclosing(chunks):
+            async for content in chunks:
+                parts.append(content)
+                await queue.put(
+                    ("plan_chunk", {"scheme_name": scheme, "content": content})
+                )
+        return "".join(parts)
+
+    async def produce(scheme):
+        async with semaphore:
+            try:
+                plan = await asyncio.wait_for(consume(scheme), timeout)
+            except Exception as e:
+                logger.warning("Promotion plan for %s failed: %r", scheme, e)
+                await queue.put(
+                    ("plan_error", {"scheme_name": scheme, "error": str(e)})
+                )
+            else:
+                await queue.put(("plan_done", {"scheme_name": scheme, "plan": plan}))
+
+    tasks = [asyncio.create_task(produce(scheme)) for scheme in schemes]
+    failed_schemes = []
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event, data = await queue.get()
+            if event == "plan_error":
+                failed_schemes.append(data["scheme_name"])
+            if event in ("plan_done", "plan_error"):
+                remaining -= 1
+            yield event, data
+        yield "done", {"failed_schemes": failed_schemes}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def collate_and_generate_plan(
     post_office_name,
     model1,
     model2,
-    x_df,
+    x_store_1,
+    x_store_2,
     final_df,
-    numeric_cols_1,
-    numeric_cols_2,
     months=23,
     month_offset=1,
     top_n_schemes=3,
     include_neighbor_vote=True,
 ):
-    top_schemes = collate_predictions(
+    top_schemes = await asyncio.to_thread(
+        collate_predictions,
         post_office_name,
         model1,
         model2,
-        x_df,
+        x_store_1,
+        x_store_2,
         final_df,
-        numeric_cols_1,
-        numeric_cols_2,
         months,
         month_offset,
         top_n_schemes,
         include_neighbor_vote,
     )
-    plan_list = []
-    for scheme in top_schemes:
-        scheme_details = post_office_schemes[scheme]
-        demographics_data = get_demographics(post_office_name)
-        plan = generate_promotion_plan(scheme, scheme_details, demographics_data)
-        plan_list.append(plan)
-    return plan_list
\ No newline at end of file
+    demographics_data = get_demographics(post_office_name)
+    return await generate_promotion_plans(top_schemes, demographics_data)
+
+
+async def prewarm_plan_cache(
+    cluster_label,
+    model1,
+    model2,
+    x_store_1,
+    x_store_2,
+    final_df,
+    top_n_schemes=3,
+    concurrency=PLAN_CONCURRENCY,
+):
+    """
+    Generates and caches the promotion plans of every post office in a
+    cluster, `concurrency` post offices at a time. Returns the number of post
+    offices processed and of plans that failed.
+    """
+    post_office_names = final_df.loc[
+        final_df["cluster_label"] == cluster_label, "Post Office Name"
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prewarm(post_office_name):
+        async with semaphore:
+            try:
+                _, failed_schemes = await collate_and_generate_plan(
+                    post_office_name,
+                    model1,
+                    model2,
+                    x_store_1,
+                    x_store_2,
+                    final_df,
+                    top_n_schemes=top_n_schemes,
+                )
+            except ValueError as e:
+                logger.warning("Skipping %s: %s", post_office_name, e)
+                return None
+            return len(failed_schemes)
+
+    results = await asyncio.gather(*(prewarm(name) for name in post_office_names))
+    processed = [failed for failed in results if failed is not None]
+    return len(processed), sum(processed)
+
+
+def main():
+    from app.data_loading import model_1, model_2, x_store_1, x_store_2
+
+    parser = argparse.ArgumentParser(
+        description="Prewarm the promotion plan cache for a cluster."
+    )
+    parser.add_argument("cluster_label", type=int)
+    parser.add_argument("--top-n-schemes", type=int, default=3)
+    args = parser.parse_args()
+
+    if plan_cache is None:
+        parser.error("The plan cache is disabled (PLAN_CACHE_PATH is empty).")
+
+    processed, failed = asyncio.run(
+        prewarm_plan_cache(
+            args.cluster_label,
+            model_1,
+            model_2,
+            x_store_1,
+            x_store_2,
+            final_df,
+            args.top_n_schemes,
+        )
+    )
+    print(
+        f"Prewarmed {processed} post offices of cluster {args.cluster_label} "
+        f"({failed} failed plans); cache: {plan_cache.stats()}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# app/recommendation_table.py
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Part of the data version: bump it when the scores change for the same
+# inputs (rank_schemes, the NBF formula) or when this file format changes, so
+# that tables and caches built by older code are not served as current
+SCORING_VERSION = 1
+
+
+class RecommendationTable:
+    """
+    Precomputed final scores and scheme rankings of every post office for each
+    calendar month, as written by `python -m app.batch_scoring`.
+
+    Each kind ("scheme" and "insurance") holds the scored post office names,
+    the output columns, a (month x post office x scheme) score array and the
+    matching ranking of column positions, best first. The scores are those of
+    `months` long model input windows; other windows are not looked up.
+    """
+
+    kinds = ("scheme", "insurance")
+
+    def __init__(self, tables, data_version, months=23):
+        self.tables = tables
+        self.data_version = data_version
+        self.months = months
+        self.indexes = {
+            kind: {name: i for i, name in enumerate(table["names"])}
+            for kind, table in tables.items()
+        }
+
+    @staticmethod
+    def rank(scores):
+        """
+        Orders the last axis of `scores` from best to worst, NaNs last and
+        equal scores in column order.
+        """
+        return np.argsort(
+            -np.nan_to_num(scores, nan=-np.inf), axis=-1, kind="stable"
+        ).astype(np.int8)
+
+    def save(self, path):
+        arrays = {
+            "data_version": np.array(self.data_version),
+            "months": np.array(self.months),
+        }
+        for kind, table in self.tables.items():
+            for key, value in table.items():
+                arrays[f"{kind}_{key}"] = np.asarray(value)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, data_version=None):
+        """
+        Loads a table, returning None if it is missing or was built from a
+        different data version.
+        """
+        if not os.path.exists(path):
+            logger.warning(
+                "No recommendation table at %s, scoring live; build it with "
+                "`python -m app.batch_scoring`",
+                path,
+            )
+            return None
+        with np.load(path, allow_pickle=False) as arrays:
+            if data_version is not None and str(arrays["data_version"]) != data_version:
+                logger.warning(
+                    "Recommendation table %s is stale (data version %s, current %s), "
+                    "scoring live; rebuild it with `python -m app.batch_scoring`",
+                    path,
+                    arrays["data_version"],
+                    data_version,
+                )
+                return None
+            tables = {
+                kind: {
+                    key: arrays[f"{kind}_{key}"]
+                    for key in ("names", "cols", "scores", "ranking")
+                }
+                for kind in cls.kinds
+                if f"{kind}_names" in arrays
+            }
+            months = int(arrays["months"])
+        return cls(tables, str(data_version), months)
+
+    def lookup(
+        self,
+        post_office_names,
+        current_month,
+        top_n_schemes=3,
+        is_insurance=False,
+        months=23,
+    ):
+        """
+        Returns the top schemes of each post office for the month, or None if
+        any of them is not in the table or it was scored over other windows.
+        """
+        kind = "insurance" if is_insurance else "scheme"
+        if kind not in self.tables or months != self.months:
+            return None
+        table = self.tables[kind]
+        index = self.indexes[kind]
+
+        rows = [index.get(name) for name in post_office_names]
+        if any(row is None for row in rows):
+            return None
+
+        ranking = table["ranking"][current_month - 1, rows, :top_n_schemes]
+        return [[str(col) for col in table["cols"][order]] for order in ranking]
@@ -0,0 +1,75 @@
+# app/registry.py
+import threading
+import time
+
+
+class ResourceRegistry:
+    """
+    Named resources (models, datasets, indexes, clients) built by a loader
+    function the first time they are asked for, then kept.
+
+    Loading is thread-safe and happens once per resource. `set` replaces a
+    resource outright, e.g. to inject synthetic data. `timings` records how
+    long each loader took, including the first load of any resources it
+    asked for itself.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._loaders = {}
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def loader(self, name):
+        def decorator(fn):
+            self.register(name, fn)
+            return fn
+
+        return decorator
+
+    def __contains__(self, name):
+        return name in self._loaders or name in self._values
+
+    def get(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._locks[name]:
+            if name not in self._values:
+                start = time.perf_counter()
+                value = self._loaders[name]()
+                with self._lock:
+                    self.timings[name] = time.perf_counter() - start
+                    self._values[name] = value
+        return self._values[name]
+
+    def set(self, name, value):
+        with self._lock:
+            self._locks.setdefault(name, threading.Lock())
+            self._values[name] = value
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def load_all(self):
+        for name in list(self._loaders):
+            self.get(name)
+
+    def report(self):
+        # Snapshot, as other threads may be loading resources meanwhile
+        with self._lock:
+            loaded = set(self._values)
+            timings = dict(self.timings)
+        return {
+            "loaded": [name for name in self._loaders if name in loaded],
+            "pending": [name for name in self._loaders if name not in loaded],
+            "load_seconds": {
+                name: round(seconds, 4) for name, seconds in timings.items()
+            },
+        }
@@ -0,0 +1,184 @@
+# app/result_cache.py
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SharedResultStore:
+    """
+    SQLite file holding serialized results, shared by the worker processes of
+    one host. Only rows of the current generation are ever read; the others
+    are deleted when the generation rolls over. The least recently used rows
+    are evicted beyond `max_bytes` of values.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                generation TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)"
+        )
+
+    def get(self, key, generation):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ? AND generation = ?",
+                (key, generation),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return bytes(row[0])
+
+    def put(self, key, generation, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, generation, value, len(value), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT TOTAL(size) FROM results").fetchone()
+        if total > self.max_bytes:
+            # Keeps the most recently used rows that fit in max_bytes
+            self._conn.execute(
+                """
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (
+                            ORDER BY accessed_at DESC, rowid DESC
+                        ) AS kept
+                        FROM results
+                    ) WHERE kept > ?
+                )
+                """,
+                (self.max_bytes,),
+            )
+
+    def purge(self, generation):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM results WHERE generation != ?", (generation,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """
+    LRU cache of serialized responses, bounded by their total size in bytes.
+
+    Every lookup passes the current generation, e.g. the data version and
+    month; when it changes the cache is emptied, so results never outlive the
+    data or month they were computed for. A SharedResultStore can back the
+    in-process entries so that other workers reuse them.
+    """
+
+    def __init__(self, max_bytes, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.generation = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(key, default=str)
+
+    @staticmethod
+    def _generation(generation):
+        return json.dumps(generation, default=str)
+
+    def _roll(self, generation):
+        if generation != self.generation:
+            self._entries.clear()
+            self._bytes = 0
+            self.generation = generation
+            if self.shared is not None:
+                self.shared.purge(generation)
+
+    def get(self, key, generation):
+        key, generation = self._key(key), self._generation(generation)
+        with self._lock:
+            self._roll(generation)
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.shared is not None:
+            value = self.shared.get(key, generation)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store(key, generation, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, generation, value):
+        key, generation = self._key(key), self._generation(generation)
+        with self._lock:
+            self._store(key, generation, value)
+        if self.shared is not None:
+            self.shared.put(key, generation, value)
+
+    def _store(self, key, generation, value):
+        self._roll(generation)
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = value
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
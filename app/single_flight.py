@@ -0,0 +1,80 @@
+# app/single_flight.py
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller
+    runs the computation and the others wait for its result (or exception)
+    instead of repeating it. Works for plain functions called from threads
+    (`run`) and for coroutine functions on the event loop (`run_async`).
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.calls = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._tasks = {}
+
+    def run(self, key, fn, *args, **kwargs):
+        if not self.enabled:
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            self.calls += 1
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    async def run_async(self, key, fn, *args, **kwargs):
+        if not self.enabled:
+            return await fn(*args, **kwargs)
+
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(fn(*args, **kwargs))
+                task.add_done_callback(lambda done: self._forget(key, done))
+            else:
+                self.coalesced += 1
+        # A caller that goes away must not cancel the others' computation
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._futures) + len(self._tasks)
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "executions": self.calls - self.coalesced,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+        }
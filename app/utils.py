@@ -1,270 +1,478 @@
 import pandas as pd
 import numpy as np
 import os
-from sklearn.neighbors import NearestNeighbors
 from collections import Counter
 from datetime import datetime
 from app.data_loading import (
-    x_df,
-    x_df_ins,
     final_df,
-    model_1,
-    model_2,
-    model_1_ins,
-    model_2_ins,
-    numeric_cols_1,
-    numeric_cols_2,
-    numeric_cols_1_ins,
-    numeric_cols_2_ins,
+    neighbor_index,
+    past_sc_r,
+    past_sc_r_ins,
+    po_index,
+    recommendation_table,
 )
-from app.nbf_functions import calculate_nbf
+from app.feature_store import PastRecordStore
+from app.nbf_functions import (
+    calculate_nbf,
+    calculate_nbf_matrix,
+    find_demographics,
+    has_demographics,
+)
+from app.recommendation_table import RecommendationTable
+
+
+SCHEME_OUTPUT_COLS = [
+    "15-Year Public Provident Fund Account (PPF)",
+    "5-Year Post Office Recurring Deposit (RD)",
+    "Kisan Vikas Patra (KVP)",
+    "Mahila Samman Savings Certificate",
+    "National Savings Certificates (NSC)",
+    "Post Office Monthly Income Scheme (MIS)",
+    "Post Office Savings Account (SB)",
+    "Post Office Time Deposit Account (TD)",
+    "Senior Citizen Savings Scheme (SCSS)",
+    "Sukanya Samriddhi Accounts (SSA)",
+]
+
+INSURANCE_OUTPUT_COLS = [
+    "10 Years Rural PLI (Gram Priya)",
+    "Anticipated Endowment Assurance (Gram Sumangal)",
+    "Anticipated Endowment Assurance (Sumangal)",
+    "Convertible Whole Life Assurance (Gram Suvidha)",
+    "Convertible Whole Life Assurance (Suvidha)",
+    "Endowment Assurance (Gram Santosh)",
+    "Endowment Assurance (Santosh)",
+    "Joint Life Assurance (Yugal Suraksha)",
+    "Whole Life Assurance (Gram Suraksha)",
+    "Whole Life Assurance (Suraksha)",
+]
+
+
+# Latest enrollments per post office, in the same order as the model outputs
+past_records = PastRecordStore(past_sc_r, SCHEME_OUTPUT_COLS, po_index)
+past_records_ins = PastRecordStore(past_sc_r_ins, INSURANCE_OUTPUT_COLS, po_index)
 
 
 def get_similar_post_offices(post_office_name, final_df, n_neighbors=5):
-    non_features = ["Post Office Name", "cluster_label"]
-    target_point = final_df[final_df["Post Office Name"] == post_office_name].iloc[0]
-    cluster_label = target_point["cluster_label"]
-
-    cluster_data = final_df[final_df["cluster_label"] == cluster_label]
-    cluster_data_numeric = (
-        cluster_data.drop(columns=non_features, errors="ignore")
-        .select_dtypes(include=[np.number])
-    )
-
-    knn = NearestNeighbors(n_neighbors=n_neighbors + 1, metric="euclidean")
-    knn.fit(cluster_data_numeric)
-
-    target_features = cluster_data_numeric.loc[
-        final_df["Post Office Name"] == post_office_name
-    ]
-    distances, indices = knn.kneighbors(target_features)
-
-    distances = distances[0]
-    indices = indices[0]
-
-    mask = final_df.iloc[indices]["Post Office Name"] != post_office_name
-    indices = indices[mask]
-    distances = distances[mask]
-
+    indices, distances = neighbor_index.query(post_office_name, n_neighbors)
     neighbors = final_df.iloc[indices]
     return neighbors, distances
 
 
-def predict_schemes_model1(
-    post_office_name, model, x_df, final_df, numeric_cols_1, months=23
-):
-    po_data = x_df[x_df["Post Office Name"] == post_office_name].sort_values("Month")
-    if len(po_data) < months:
-        raise ValueError("Not enough data for this post office.")
-
-    x_matrix = po_data[numeric_cols_1].values[:months]
+def get_neighbor_names(post_office_name, final_df, context=None):
+    if context is not None and post_office_name in context.neighbors:
+        return context.neighbors[post_office_name]
     neighbors, _ = get_similar_post_offices(post_office_name, final_df)
+    return neighbors["Post Office Name"].unique()
+
 
-    neighbor_matrices = []
-    for n_po_name in neighbors["Post Office Name"].unique():
-        n_po_data = x_df[x_df["Post Office Name"] == n_po_name].sort_values("Month")
-        if len(n_po_data) >= months:
-            n_matrix = n_po_data[numeric_cols_1].values[:months]
-            neighbor_matrices.append(n_matrix)
+def neighbor_average(post_office_name, x_store, final_df, months=23, context=None):
+    x_matrix = x_store.window(post_office_name, months)
+    neighbor_names = get_neighbor_names(post_office_name, final_df, context)
 
+    neighbor_matrices = x_store.windows(neighbor_names, months)
     if len(neighbor_matrices) == 0:
         neighbor_avg = np.zeros_like(x_matrix)
     else:
-        neighbor_avg = np.mean(np.stack(neighbor_matrices), axis=0)
+        neighbor_avg = np.mean(neighbor_matrices, axis=0)
+    return x_matrix, neighbor_avg
 
-    combined = np.concatenate([x_matrix, neighbor_avg], axis=1)
-    input_vector = combined.flatten().reshape(1, -1)
 
+def build_model1_inputs(post_office_names, x_store, final_df, months=23, context=None):
+    rows = []
+    for post_office_name in post_office_names:
+        x_matrix, neighbor_avg = neighbor_average(
+            post_office_name, x_store, final_df, months, context
+        )
+        combined = np.concatenate([x_matrix, neighbor_avg], axis=1)
+        rows.append(combined.flatten())
+    return np.stack(rows)
+
+
+def build_three_branch_inputs(
+    post_office_names, x_store, final_df, months=23, context=None
+):
+    main_rows, neighbor_rows = [], []
+    for post_office_name in post_office_names:
+        x_matrix, neighbor_avg = neighbor_average(
+            post_office_name, x_store, final_df, months, context
+        )
+        main_rows.append(x_matrix)
+        neighbor_rows.append(neighbor_avg)
+
+    X_lstm_series = np.stack(main_rows)
+    X_main_vec = X_lstm_series.reshape(len(main_rows), -1)
+    X_neighbor_vec = np.stack(neighbor_rows).reshape(len(neighbor_rows), -1)
+    return [X_main_vec, X_neighbor_vec, X_lstm_series]
+
+
+def predict_schemes_model1(
+    post_office_name, model, x_store, final_df, months=23
+):
+    input_vector = build_model1_inputs([post_office_name], x_store, final_df, months)
     prediction = model.predict(input_vector)
     return prediction[0]
 
 
 def predict_with_three_branches(
-    post_office_name, model, x_df, final_df, numeric_cols_2, months=23
+    post_office_name, model, x_store, final_df, months=23
 ):
-    x_po = x_df[x_df["Post Office Name"] == post_office_name].sort_values("Month")
-    if len(x_po) < months:
-        raise ValueError("Not enough data for this post office.")
-    x_matrix = x_po[numeric_cols_2].values[:months]
+    inputs = build_three_branch_inputs([post_office_name], x_store, final_df, months)
+    prediction = model.predict(inputs)
+    return prediction[0]
 
-    target_point = final_df[final_df["Post Office Name"] == post_office_name].iloc[0]
-    cluster_label = target_point["cluster_label"]
-    cluster_data = final_df[final_df["cluster_label"] == cluster_label]
-    neighbors, _ = get_similar_post_offices(post_office_name, final_df)
 
-    neighbor_matrices = []
-    for n_po in neighbors["Post Office Name"].unique():
-        n_x_po = x_df[x_df["Post Office Name"] == n_po].sort_values("Month")
-        if len(n_x_po) >= months:
-            n_matrix = n_x_po[numeric_cols_2].values[:months]
-            neighbor_matrices.append(n_matrix)
+def build_ensemble_inputs(
+    post_office_names, x_store_1, x_store_2, final_df, months=23, context=None
+):
+    """
+    Returns the model_1 input followed by the three model_2 inputs.
+    """
+    return [
+        build_model1_inputs(post_office_names, x_store_1, final_df, months, context),
+        *build_three_branch_inputs(
+            post_office_names, x_store_2, final_df, months, context
+        ),
+    ]
 
-    if len(neighbor_matrices) == 0:
-        neighbor_avg = np.zeros_like(x_matrix)
-    else:
-        neighbor_avg = np.mean(np.stack(neighbor_matrices), axis=0)
 
-    X_main_vec = x_matrix.flatten().reshape(1, -1)
-    X_neighbor_vec = neighbor_avg.flatten().reshape(1, -1)
-    X_lstm_series = x_matrix.reshape(1, months, x_matrix.shape[1])
+def predict_ensemble(
+    post_office_names,
+    model1,
+    model2,
+    x_store_1,
+    x_store_2,
+    final_df,
+    months=23,
+    context=None,
+):
+    """
+    Runs both models once on the stacked inputs of all given post offices and
+    returns the blended predictions, one row per post office.
+    """
+    inputs = build_ensemble_inputs(
+        post_office_names, x_store_1, x_store_2, final_df, months, context
+    )
+    pred1 = model1.predict(inputs[0])
+    pred2 = model2.predict(inputs[1:])
+    # Take average, giving more weight to model2
+    return 0.7 * pred1 + 0.3 * pred2
 
-    prediction = model.predict([X_main_vec, X_neighbor_vec, X_lstm_series])
-    return prediction[0]
+
+def predict_fused_ensemble(
+    post_office_names,
+    fused_ensemble,
+    x_store_1,
+    x_store_2,
+    x_store_1_ins,
+    x_store_2_ins,
+    final_df,
+    months=23,
+    context=None,
+):
+    """
+    Returns the blended scheme and insurance predictions of all given post
+    offices from a single FusedEnsemble call.
+    """
+    return fused_ensemble.predict(
+        build_ensemble_inputs(
+            post_office_names, x_store_1, x_store_2, final_df, months, context
+        ),
+        build_ensemble_inputs(
+            post_office_names, x_store_1_ins, x_store_2_ins, final_df, months, context
+        ),
+    )
+
+
+def get_voting_group(post_office_name, final_df, include_neighbor_vote=False):
+    """
+    Returns the post office followed by its voting neighbors, and the
+    neighbor distances.
+    """
+    post_office_names = [post_office_name]
+    distances = np.empty(0)
+    if include_neighbor_vote:
+        neighbors, distances = get_similar_post_offices(post_office_name, final_df)
+        post_office_names += list(neighbors["Post Office Name"])
+    return post_office_names, distances
+
+
+class RequestContext:
+    """
+    Everything about a post office that the scheme and insurance pipelines of
+    one request share: its voting group and neighbor distances, the
+    neighbors used for each member's model inputs, their demographics rows
+    and the current month. Built once per request and read-only afterwards.
+    """
+
+    def __init__(
+        self,
+        post_office_name,
+        final_df,
+        include_neighbor_vote=False,
+        current_month=None,
+    ):
+        self.post_office_name = post_office_name
+        self.include_neighbor_vote = include_neighbor_vote
+        self.current_month = (
+            pd.Timestamp.now().month if current_month is None else current_month
+        )
+
+        self.post_office_names, self.distances = get_voting_group(
+            post_office_name, final_df, include_neighbor_vote
+        )
+        self.neighbors = {
+            name: get_neighbor_names(name, final_df) for name in self.post_office_names
+        }
+        self.demographics = {
+            name: find_demographics(name)
+            for name in self.post_office_names
+            if has_demographics(name)
+        }
 
 
 def get_past_scheme_records(post_office_name, is_insurance=False):
-    if is_insurance:
-        past_records = pd.read_csv("data/past_scheme_insurance_records.csv")
-    else:
-        past_records = pd.read_csv("data/past_scheme_records.csv")
-    past_records = past_records[past_records["Post Office Name"] == post_office_name]
-
-    past_records = past_records[["Scheme", "Month_24"]].T
-    past_records.columns = past_records.iloc[0]
-    past_records.drop(past_records.index[0], inplace=True)
-    if is_insurance:
-        past_records = past_records[
-            [
-                "Whole Life Assurance (Gram Suraksha)",
-                "Endowment Assurance (Santosh)",
-                "Joint Life Assurance (Yugal Suraksha)",
-                "Anticipated Endowment Assurance (Sumangal)",
-                "Convertible Whole Life Assurance (Suvidha)",
-                "Convertible Whole Life Assurance (Gram Suvidha)",
-                "Endowment Assurance (Gram Santosh)",
-                "10 Years Rural PLI (Gram Priya)",
-                "Anticipated Endowment Assurance (Gram Sumangal)",
-                "Whole Life Assurance (Suraksha)",
-            ]
-        ]
-        return past_records.iloc[0]
-    else:
-        past_records = past_records[
-            [
-                "15-Year Public Provident Fund Account (PPF)",
-                "5-Year Post Office Recurring Deposit (RD)",
-                "Kisan Vikas Patra (KVP)",
-                "Mahila Samman Savings Certificate",
-                "National Savings Certificates (NSC)",
-                "Post Office Monthly Income Scheme (MIS)",
-                "Post Office Savings Account (SB)",
-                "Post Office Time Deposit Account (TD)",
-                "Senior Citizen Savings Scheme (SCSS)",
-                "Sukanya Samriddhi Accounts (SSA)",
-            ]
-        ]
-        return past_records.iloc[0]
+    store = past_records_ins if is_insurance else past_records
+    return pd.Series(store.records(post_office_name), index=store.schemes)
+
+
+# Bump recommendation_table.SCORING_VERSION when the scores change
+def final_scores(ensemble_preds, past_enrollment, nbf):
+    """
+    Weighs the predicted growth over past enrollment by the NBF scores, 1
+    where unknown. Takes one post office's schemes or a (post office x
+    scheme) array.
+    """
+    growth_rate = (ensemble_preds - past_enrollment) / np.where(
+        past_enrollment == 0, 1, past_enrollment
+    )
+    return growth_rate * np.where(np.isnan(nbf), 1, nbf)
+
+
+def rank_schemes(
+    post_office_name,
+    ensemble_pred,
+    top_n_schemes=3,
+    is_insurance=False,
+    current_month=None,
+    demographics=None,
+):
+    output_cols = INSURANCE_OUTPUT_COLS if is_insurance else SCHEME_OUTPUT_COLS
+
+    if current_month is None:
+        current_month = pd.Timestamp.now().month
+    nbf = calculate_nbf(post_office_name, current_month, is_insurance, demographics)
+
+    past_enrollment = get_past_scheme_records(post_office_name, is_insurance)
+    scores = final_scores(
+        np.asarray(ensemble_pred),
+        past_enrollment.reindex(output_cols).to_numpy(),
+        nbf.reindex(output_cols).to_numpy(),
+    )
+    # Same order as the bulk ranking: by score, ties in column order
+    ranking = RecommendationTable.rank(scores)[:top_n_schemes]
+    return [output_cols[i] for i in ranking]
+
+
+def neighbor_vote(top_schemes, neighbor_top_schemes, distances, top_n_schemes=3):
+    scheme_votes = Counter()
+
+    # Add the main PO top schemes with weight = 1
+    for s in top_schemes:
+        scheme_votes[s] += 1.0
+
+    for dist, n_top_schemes in zip(distances, neighbor_top_schemes):
+        # Weight = inverse of distance
+        weight = 1.0 / (dist + 1e-6)
+        for s in n_top_schemes:
+            scheme_votes[s] += weight
+
+    # After collecting votes, pick the top_n_schemes again
+    final_schemes = sorted(
+        scheme_votes.items(), key=lambda x: x[1], reverse=True
+    )[:top_n_schemes]
+    return [fs[0] for fs in final_schemes]
 
 
 def collate_predictions(
     post_office_name,
     model1,
     model2,
-    x_df,
+    x_store_1,
+    x_store_2,
     final_df,
-    numeric_cols_1,
-    numeric_cols_2,
     months=23,
     month_offset=1,
     top_n_schemes=3,
     include_neighbor_vote=False,
     is_insurance=False,
+    ensemble_preds=None,
+    context=None,
 ):
-    if not is_insurance:
-        output_cols = [
-            "15-Year Public Provident Fund Account (PPF)",
-            "5-Year Post Office Recurring Deposit (RD)",
-            "Kisan Vikas Patra (KVP)",
-            "Mahila Samman Savings Certificate",
-            "National Savings Certificates (NSC)",
-            "Post Office Monthly Income Scheme (MIS)",
-            "Post Office Savings Account (SB)",
-            "Post Office Time Deposit Account (TD)",
-            "Senior Citizen Savings Scheme (SCSS)",
-            "Sukanya Samriddhi Accounts (SSA)",
-        ]
-    else:
-        output_cols = [
-            "10 Years Rural PLI (Gram Priya)",
-            "Anticipated Endowment Assurance (Gram Sumangal)",
-            "Anticipated Endowment Assurance (Sumangal)",
-            "Convertible Whole Life Assurance (Gram Suvidha)",
-            "Convertible Whole Life Assurance (Suvidha)",
-            "Endowment Assurance (Gram Santosh)",
-            "Endowment Assurance (Santosh)",
-            "Joint Life Assurance (Yugal Suraksha)",
-            "Whole Life Assurance (Gram Suraksha)",
-            "Whole Life Assurance (Suraksha)",
+    """
+    Returns the top schemes for a post office. `ensemble_preds` may hold
+    already blended predictions for the post office followed by its voting
+    neighbors, e.g. from predict_fused_ensemble. A RequestContext shared with
+    the other pipeline of the request can be passed as `context`, in which
+    case its voting group is used.
+    """
+    if context is None:
+        context = RequestContext(post_office_name, final_df, include_neighbor_vote)
+    post_office_names, distances = context.post_office_names, context.distances
+    include_neighbor_vote = context.include_neighbor_vote
+
+    current_month = context.current_month
+    ranked = None
+    if recommendation_table is not None:
+        ranked = recommendation_table.lookup(
+            post_office_names, current_month, top_n_schemes, is_insurance, months
+        )
+
+    if ranked is None:
+        if ensemble_preds is None:
+            # Get predictions from deep learning models for the PO and its
+            # neighbors in a single batch
+            ensemble_preds = predict_ensemble(
+                post_office_names,
+                model1,
+                model2,
+                x_store_1,
+                x_store_2,
+                final_df,
+                months,
+                context,
+            )
+        ranked = [
+            rank_schemes(
+                name,
+                pred,
+                top_n_schemes,
+                is_insurance,
+                current_month,
+                context.demographics.get(name),
+            )
+            for name, pred in zip(post_office_names, ensemble_preds)
         ]
-    # Get predictions from deep learning models
-    pred1 = predict_schemes_model1(
-        post_office_name, model1, x_df, final_df, numeric_cols_1, months
-    )
-    pred2 = predict_with_three_branches(
-        post_office_name, model2, x_df, final_df, numeric_cols_2, months
-    )
-    # Take average, giving more weight to model2
-    ensemble_pred = 0.7 * pred1 + 0.3 * pred2
-    dl_avg_series = pd.Series(ensemble_pred, index=output_cols)
 
-    ensemble_pred = dl_avg_series
+    top_schemes = ranked[0]
+    if include_neighbor_vote:
+        # Perform neighbor voting
+        top_schemes = neighbor_vote(
+            top_schemes, ranked[1:], distances, top_n_schemes
+        )
 
-    current_month = pd.Timestamp.now().month
-    nbf = calculate_nbf(post_office_name, current_month, is_insurance)
+    return top_schemes
 
-    # Integrate NBF scores
-    nbf_series = pd.Series(nbf, index=output_cols).fillna(1)
-    past_enrollment = get_past_scheme_records(post_office_name, is_insurance)
-    difference = ensemble_pred - past_enrollment
 
-    # Calculate the growth rate
-    growth_rate = difference / past_enrollment.replace(0, 1)
-    final_scores = growth_rate * nbf_series.reindex(dl_avg_series.index).fillna(1)
+def check_scoreable(post_office_name, x_store_1, x_store_2, months=23, is_insurance=False):
+    """
+    Raises the ValueError collate_predictions would raise for a post office
+    that cannot be scored.
+    """
+    if not (
+        x_store_1.has_window(post_office_name, months)
+        and x_store_2.has_window(post_office_name, months)
+    ):
+        raise ValueError("Not enough data for this post office.")
+    if post_office_name not in (past_records_ins if is_insurance else past_records):
+        raise ValueError("No past scheme records for this post office.")
+    if not has_demographics(post_office_name):
+        raise ValueError("Post office not found in demographics data.")
 
-    top_schemes = (
-        final_scores.sort_values(ascending=False).head(top_n_schemes).index.tolist()
-    )
 
-    if include_neighbor_vote:
-        # Perform neighbor voting
-        neighbors, distances = get_similar_post_offices(post_office_name, final_df)
-        scheme_votes = Counter()
-
-        # Add the main PO top schemes with weight = 1
-        for s in top_schemes:
-            scheme_votes[s] += 1.0
-
-        # For each neighbor, get their top schemes
-        for dist, nrow in zip(distances, neighbors.itertuples()):
-            n_po_name = getattr(nrow, "Post Office Name")
-            # Avoid recursion with neighbor voting
-            n_top_schemes = collate_predictions(
-                n_po_name,
-                model1,
-                model2,
-                x_df,
-                final_df,
-                numeric_cols_1,
-                numeric_cols_2,
-                months=months,
-                month_offset=month_offset,
-                top_n_schemes=top_n_schemes,
-                include_neighbor_vote=False,
+def rank_schemes_bulk(
+    post_office_names, ensemble_preds, nbf_matrix, top_n_schemes=3, is_insurance=False
+):
+    """
+    rank_schemes for many post offices at once, given the
+    calculate_nbf_matrix of the month.
+    """
+    store = past_records_ins if is_insurance else past_records
+    past_enrollment = np.stack([store.records(name) for name in post_office_names])
+    nbf = nbf_matrix.reindex(index=post_office_names, columns=store.schemes)
+    scores = final_scores(ensemble_preds, past_enrollment, nbf.to_numpy())
+    ranking = RecommendationTable.rank(scores)[:, :top_n_schemes]
+    return [[store.schemes[i] for i in row] for row in ranking]
+
+
+def collate_predictions_bulk(
+    post_office_names,
+    model1,
+    model2,
+    x_store_1,
+    x_store_2,
+    final_df,
+    months=23,
+    top_n_schemes=3,
+    include_neighbor_vote=False,
+    is_insurance=False,
+    current_month=None,
+    chunk_size=256,
+):
+    """
+    collate_predictions for many post offices, `chunk_size` at a time so that
+    memory stays bounded. Each chunk and its voting neighbors go through the
+    models in one batch and are ranked against a single NBF matrix.
+
+    Yields a (post office name, top schemes) pair per post office, in order,
+    with the ValueError in place of the top schemes if it cannot be scored.
+    """
+    if current_month is None:
+        current_month = pd.Timestamp.now().month
+    nbf_matrix = None
+
+    for start in range(0, len(post_office_names), chunk_size):
+        chunk = post_office_names[start : start + chunk_size]
+
+        groups, errors, members = {}, {}, {}
+        for name in chunk:
+            try:
+                group, distances = get_voting_group(
+                    name, final_df, include_neighbor_vote
+                )
+                for member in group:
+                    if member not in members:
+                        check_scoreable(
+                            member, x_store_1, x_store_2, months, is_insurance
+                        )
+                        members[member] = len(members)
+                groups[name] = group, distances
+            except ValueError as e:
+                errors[name] = e
+
+        members = list(members)
+        ranked = None
+        if recommendation_table is not None and members:
+            ranked = recommendation_table.lookup(
+                members, current_month, top_n_schemes, is_insurance
             )
-            # Weight = inverse of distance
-            weight = 1.0 / (dist + 1e-6)
-            for s in n_top_schemes:
-                scheme_votes[s] += weight
-
-        # After collecting votes, pick the top_n_schemes again
-        final_schemes = sorted(
-            scheme_votes.items(), key=lambda x: x[1], reverse=True
-        )[:top_n_schemes]
-        top_schemes = [fs[0] for fs in final_schemes]
+        if ranked is None and members:
+            if nbf_matrix is None:
+                nbf_matrix = calculate_nbf_matrix(current_month, is_insurance)
+            ensemble_preds = predict_ensemble(
+                members, model1, model2, x_store_1, x_store_2, final_df, months
+            )
+            ranked = rank_schemes_bulk(
+                members, ensemble_preds, nbf_matrix, top_n_schemes, is_insurance
+            )
+        ranked = dict(zip(members, ranked or []))
+
+        for name in chunk:
+            if name in errors:
+                yield name, errors[name]
+                continue
+            group, distances = groups[name]
+            top_schemes = ranked[name]
+            if include_neighbor_vote:
+                top_schemes = neighbor_vote(
+                    top_schemes,
+                    [ranked[member] for member in group[1:]],
+                    distances,
+                    top_n_schemes,
+                )
+            yield name, top_schemes
 
-    return top_schemes
 
 def get_demographics(post_office_name):
-    return final_df[final_df["Post Office Name"] == post_office_name].drop(
-        columns=["cluster_label"]
-    )
+    rows = [po_index.ids[post_office_name]] if post_office_name in po_index else []
+    return final_df.iloc[rows].drop(columns=["cluster_label"])
@@ -0,0 +1,21 @@
+# tests/conftest.py
+"""
+app.data_loading reads the datasets and models from the working directory
+when it is imported, and most of them are not in the tree. The tests run in
+a temporary directory holding synthetic ones (see tests/synthetic.py), made
+before any test imports the app. The on-disk plan cache is disabled.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import synthetic
+
+sys.path.insert(0, synthetic.REPO_DIR)
+
+data_dir = tempfile.mkdtemp(prefix="post-office-tests-")
+atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+synthetic.write_files(data_dir)
+os.chdir(data_dir)
+os.environ.setdefault("PLAN_CACHE_PATH", "")
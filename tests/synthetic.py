@@ -0,0 +1,289 @@
+# tests/synthetic.py
+"""
+Synthetic stand-ins for the datasets and models that are not in the tree,
+shaped like the real ones (same columns, dtypes and model input signatures).
+
+`write_files` lays them out in a directory the way app.data_loading expects
+to find them. The model column lists and post_office_schemes.json are copied
+from the repository's data/.
+"""
+import os
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# app.utils.SCHEME_OUTPUT_COLS and INSURANCE_OUTPUT_COLS
+SCHEMES = [
+    "15-Year Public Provident Fund Account (PPF)",
+    "5-Year Post Office Recurring Deposit (RD)",
+    "Kisan Vikas Patra (KVP)",
+    "Mahila Samman Savings Certificate",
+    "National Savings Certificates (NSC)",
+    "Post Office Monthly Income Scheme (MIS)",
+    "Post Office Savings Account (SB)",
+    "Post Office Time Deposit Account (TD)",
+    "Senior Citizen Savings Scheme (SCSS)",
+    "Sukanya Samriddhi Accounts (SSA)",
+]
+INSURANCES = [
+    "10 Years Rural PLI (Gram Priya)",
+    "Anticipated Endowment Assurance (Gram Sumangal)",
+    "Anticipated Endowment Assurance (Sumangal)",
+    "Convertible Whole Life Assurance (Gram Suvidha)",
+    "Convertible Whole Life Assurance (Suvidha)",
+    "Endowment Assurance (Gram Santosh)",
+    "Endowment Assurance (Santosh)",
+    "Joint Life Assurance (Yugal Suraksha)",
+    "Whole Life Assurance (Gram Suraksha)",
+    "Whole Life Assurance (Suraksha)",
+]
+
+AGE_GROUPS = ["0-18", "19-35", "36-60", "60+"]
+GENDERS = ["Male", "Female"]
+OCCUPATIONS = ["Farmer", "Student", "Salaried Individual", "Business Owner", "Retired"]
+INCOME_LEVELS = [1, 2, 3, 4]
+
+# (season, sowing month, harvesting month, crops)
+SEASONS = [
+    ("Kharif", 6, 9, "Soybean, Maize, Paddy (Rice)"),
+    ("Kharif", 7, 10, "Cotton, Soybean"),
+    ("Kharif", 7, 11, "Paddy (Rice), Jowar"),
+    ("Rabi", 10, 3, "Wheat, Gram"),
+    ("Rabi", 11, 3, "Wheat, Gram, Mustard"),
+    ("Rabi", 11, 4, "Wheat, Lentil"),
+]
+
+MONTHS = 24
+
+# Files of the numeric_cols_* column lists of app.data_loading
+NUMERIC_COLS = {
+    "numeric_cols_1": "data/numeric_cols_dnn.pkl",
+    "numeric_cols_2": "data/numeric_cols_triple.pkl",
+    "numeric_cols_1_ins": "data/numeric_cols_insurence_dnn.pkl",
+    "numeric_cols_2_ins": "data/triple_model_insurence_columns.pkl",
+}
+
+
+def post_office_names(n_post_offices):
+    return [
+        f"Synthetic {i:05d} {'S.O' if i % 8 == 0 else 'B.O'}"
+        for i in range(n_post_offices)
+    ]
+
+
+def district_names(n_districts):
+    return [f"District {i:02d}" for i in range(n_districts)]
+
+
+def make_agriculture_df(districts, rng):
+    rows = []
+    for district in districts:
+        season, sowing, harvesting, crops = SEASONS[rng.integers(len(SEASONS))]
+        rows.append((district, season, crops, sowing, harvesting))
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "District",
+            "Season",
+            "Major Crops",
+            "Sowing Period Numeric",
+            "Harvesting Period Numeric",
+        ],
+    )
+
+
+def make_final_df(names, po_districts, agriculture_df, rng):
+    n = len(names)
+    total_population = rng.integers(7_000, 130_000, n).astype(np.float64)
+    age_shares = rng.dirichlet(np.full(len(AGE_GROUPS), 4.0), n)
+    occupation_shares = rng.dirichlet(np.full(3, 2.0), n)
+    female_ratio = rng.uniform(0.3, 0.7, n)
+    working_age = 1 - age_shares[:, 0] - age_shares[:, 3]
+    seasons = agriculture_df.set_index("District").loc[po_districts]
+    kharif = (seasons["Season"] == "Kharif").to_numpy(dtype=np.float64)
+    return pd.DataFrame(
+        {
+            "Post Office Name": names,
+            "total_population": total_population,
+            "avg_income_level": rng.choice([2.0, 2.125, 2.25, 2.375, 2.5], n),
+            "Farmer": np.round(total_population * rng.uniform(0, 0.3, n)),
+            "female_ratio": female_ratio,
+            "male_ratio": 1 - female_ratio,
+            "pct_0-18": age_shares[:, 0],
+            "pct_19-35": age_shares[:, 1],
+            "pct_36-60": age_shares[:, 2],
+            "pct_60+": age_shares[:, 3],
+            "pct_student": age_shares[:, 0],
+            "pct_salaried_individual": occupation_shares[:, 0] * working_age,
+            "pct_business_owner": occupation_shares[:, 1] * working_age,
+            "pct_retired": age_shares[:, 3],
+            "Rural_Presence": (rng.random(n) < 0.8).astype(np.float64),
+            "kharif_presence": kharif,
+            "Sowing Period Numeric": seasons["Sowing Period Numeric"].to_numpy(),
+            "Harvesting Period Numeric": (
+                seasons["Harvesting Period Numeric"].to_numpy()
+            ),
+            # Uneven clusters, like the real ones
+            "cluster_label": rng.choice(5, n, p=[0.2, 0.24, 0.22, 0.24, 0.1]),
+        }
+    )
+
+
+def make_monthly_features(names, columns, rng):
+    """
+    One row per post office and month, shuffled like the real files.
+    """
+    columns = list(dict.fromkeys(columns))
+    df = pd.DataFrame(
+        rng.gamma(2.0, 20.0, (len(names) * MONTHS, len(columns))), columns=columns
+    )
+    df.insert(0, "Month", np.tile(np.arange(1, MONTHS + 1), len(names)))
+    df.insert(0, "Post Office Name", np.repeat(names, MONTHS))
+    return df.sample(frac=1, random_state=int(rng.integers(2**31)), ignore_index=True)
+
+
+def make_past_records(names, schemes, rng):
+    df = pd.DataFrame(
+        {
+            "Post Office Name": np.repeat(names, len(schemes)),
+            "Scheme": np.tile(schemes, len(names)),
+        }
+    )
+    enrollments = rng.poisson(rng.gamma(2.0, 15.0, (len(df), 1)), (len(df), MONTHS))
+    for month in range(MONTHS):
+        df[f"Month_{month + 1}"] = enrollments[:, month]
+    return df
+
+
+def make_demographics_df(names, po_districts, rng, rows_per_post_office=12):
+    n = len(names) * rows_per_post_office
+    return pd.DataFrame(
+        {
+            "Post Office Name": np.repeat(names, rows_per_post_office),
+            "District": np.repeat(po_districts, rows_per_post_office),
+            "Age Group": rng.choice(AGE_GROUPS, n),
+            "Gender": rng.choice(GENDERS, n),
+            "Occupation": rng.choice(OCCUPATIONS, n),
+            "Income Level": rng.choice(INCOME_LEVELS, n),
+            "Population": rng.integers(10, 500, n),
+        }
+    )
+
+
+def make_district_data(districts, rng):
+    n = len(districts)
+    return pd.DataFrame(
+        {
+            "Area_Name": districts,
+            "Workforce_Participation_Rate (%)": rng.uniform(30, 60, n),
+            "Projected_Workforce_Persons (5 Years)": rng.uniform(5e4, 5e5, n),
+            "Elderly_Workers_Projected": rng.uniform(5e3, 5e4, n),
+            "Projected_Urban_Workforce (5 Years)": rng.uniform(1e4, 2e5, n),
+            "Projected_Female_Workforce_Inclusion": rng.uniform(1e4, 2e5, n),
+        }
+    )
+
+
+def dnn_model(n_features, months=23, n_outputs=10):
+    """
+    Stand-in for model_dnn_*: the flattened (month x [features, neighbor
+    average]) window in, one score per scheme out.
+    """
+    from tensorflow import keras
+
+    inputs = keras.Input((months * 2 * n_features,))
+    hidden = keras.layers.Dense(32, activation="relu")(inputs)
+    return keras.Model(inputs, keras.layers.Dense(n_outputs)(hidden))
+
+
+def three_branch_model(n_features, months=23, n_outputs=10):
+    """
+    Stand-in for triple_model_*: the flattened window, the flattened neighbor
+    average and the window as a sequence in, one score per scheme out.
+    """
+    from tensorflow import keras
+
+    main = keras.Input((months * n_features,))
+    neighbors = keras.Input((months * n_features,))
+    sequence = keras.Input((months, n_features))
+    hidden = keras.layers.Concatenate()(
+        [
+            keras.layers.Dense(16, activation="relu")(main),
+            keras.layers.Dense(16, activation="relu")(neighbors),
+            keras.layers.LSTM(16)(sequence),
+        ]
+    )
+    return keras.Model(
+        [main, neighbors, sequence], keras.layers.Dense(n_outputs)(hidden)
+    )
+
+
+# Files of the models of app.data_loading
+MODEL_FILES = {
+    "model_1": "models/final_models/model_dnn_schemes.keras",
+    "model_2": "models/final_models/triple_model_scheme.keras",
+    "model_1_ins": "models/final_models/model_dnn_insurence.keras",
+    "model_2_ins": "models/final_models/triple_model_insurence.keras",
+}
+
+
+def make_models(numeric_cols, seed=0):
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(seed)
+    return {
+        "model_1": dnn_model(len(numeric_cols["numeric_cols_1"])),
+        "model_2": three_branch_model(len(numeric_cols["numeric_cols_2"])),
+        "model_1_ins": dnn_model(len(numeric_cols["numeric_cols_1_ins"])),
+        "model_2_ins": three_branch_model(len(numeric_cols["numeric_cols_2_ins"])),
+    }
+
+
+def write_files(directory, n_post_offices=200, n_districts=12, seed=0):
+    """
+    Writes synthetic datasets and models under `directory`, laid out like
+    the repository.
+    """
+    os.makedirs(os.path.join(directory, "data"))
+    for path in [*NUMERIC_COLS.values(), "data/post_office_schemes.json"]:
+        shutil.copy(os.path.join(REPO_DIR, path), os.path.join(directory, path))
+    numeric_cols = {}
+    for name, path in NUMERIC_COLS.items():
+        with open(os.path.join(REPO_DIR, path), "rb") as f:
+            numeric_cols[name] = list(pickle.load(f))
+
+    rng = np.random.default_rng(seed)
+    names = post_office_names(n_post_offices)
+    districts = district_names(n_districts)
+    po_districts = rng.choice(districts, n_post_offices)
+    agriculture_df = make_agriculture_df(districts, rng)
+
+    frames = {
+        "final_df.csv": make_final_df(names, po_districts, agriculture_df, rng),
+        "x.csv": make_monthly_features(
+            names, numeric_cols["numeric_cols_1"] + numeric_cols["numeric_cols_2"], rng
+        ),
+        "x_insurence.csv": make_monthly_features(
+            names,
+            numeric_cols["numeric_cols_1_ins"] + numeric_cols["numeric_cols_2_ins"],
+            rng,
+        ),
+        "y_output.csv": pd.DataFrame(columns=SCHEMES),
+        "y_output_insurence.csv": pd.DataFrame(columns=INSURANCES),
+        "past_scheme_records.csv": make_past_records(names, SCHEMES, rng),
+        "past_scheme_insurance_records.csv": make_past_records(names, INSURANCES, rng),
+        "Updated_Dataset_with_Rural_and_Urban_Population.csv": make_demographics_df(
+            names, po_districts, rng
+        ),
+        "aggriculture_dataset.csv": agriculture_df,
+        "output.csv": make_district_data(districts, rng),
+    }
+    for file_name, df in frames.items():
+        df.to_csv(os.path.join(directory, "data", file_name), index=False)
+
+    os.makedirs(os.path.join(directory, "models/final_models"))
+    for name, model in make_models(numeric_cols, seed).items():
+        model.save(os.path.join(directory, MODEL_FILES[name]))
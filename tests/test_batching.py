@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from app.batching import MicroBatcher
+
+
+class DoublingModel:
+    """
+    Returns twice its input, after waiting for `release` if given.
+    """
+
+    def __init__(self, release=None):
+        self.release = release
+        self.calls = []
+
+    def predict(self, inputs, **kwargs):
+        self.calls.append(len(inputs))
+        if self.release is not None:
+            self.release.wait(10)
+        return inputs * 2
+
+
+class LoopThread:
+    """
+    An event loop running in a thread of its own, like the server's.
+    """
+
+    def __enter__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        return self
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(10)
+
+    def __exit__(self, *exc_info):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+async def start(batcher):
+    batcher.start()
+
+
+def test_concurrent_predictions_share_a_batch():
+    model = DoublingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_delay=0.05)
+    with LoopThread() as loop_thread:
+        loop_thread.run(start(batcher))
+        inputs = [np.full((n, 3), n, dtype=np.float32) for n in (1, 2, 3)]
+        with ThreadPoolExecutor(3) as pool:
+            outputs = list(pool.map(batcher.predict, inputs))
+        loop_thread.run(batcher.stop())
+
+    for x, y in zip(inputs, outputs):
+        np.testing.assert_array_equal(y, x * 2)
+    assert sum(model.calls) == 6 and len(model.calls) < 3
+
+
+def test_batched_predictions_reject_arguments():
+    batcher = MicroBatcher(DoublingModel())
+    with LoopThread() as loop_thread:
+        loop_thread.run(start(batcher))
+        with pytest.raises(TypeError):
+            batcher.predict(np.ones((1, 3)), batch_size=8)
+        loop_thread.run(batcher.stop())
+
+
+def test_stop_fails_queued_predictions():
+    release = threading.Event()
+    model = DoublingModel(release)
+    batcher = MicroBatcher(model, max_batch_size=1, max_delay=0)
+    with LoopThread() as loop_thread:
+        loop_thread.run(start(batcher))
+        with ThreadPoolExecutor(3) as pool:
+            # The first batch blocks in the model, the others stay queued
+            futures = [pool.submit(batcher.predict, np.ones((1, 3))) for _ in range(3)]
+            while not model.calls:
+                pass
+            loop_thread.run(batcher.stop())
+            release.set()
+            errors = [future.exception(10) for future in futures]
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    # Once stopped, predictions call the model directly
+    np.testing.assert_array_equal(batcher.predict(np.ones((1, 3))), np.full((1, 3), 2))
+
+
+def test_predict_times_out():
+    release = threading.Event()
+    batcher = MicroBatcher(DoublingModel(release), max_delay=0, timeout=0.1)
+    with LoopThread() as loop_thread:
+        loop_thread.run(start(batcher))
+        with pytest.raises(TimeoutError):
+            batcher.predict(np.ones((1, 3)))
+        release.set()
+        loop_thread.run(batcher.stop())
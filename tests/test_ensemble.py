@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from app import data_loading
+from app.utils import build_ensemble_inputs, predict_ensemble
+
+# The synthetic models written by conftest, as data_loading loaded them
+MODELS = ("model_1", "model_2", "model_1_ins", "model_2_ins")
+STORES = ("x_store_1", "x_store_2", "x_store_1_ins", "x_store_2_ins")
+
+
+@pytest.fixture(scope="module")
+def models():
+    return {name: getattr(data_loading, name) for name in MODELS}
+
+
+@pytest.fixture(scope="module")
+def names():
+    return list(data_loading.final_df["Post Office Name"].iloc[:64])
+
+
+def assert_close(actual, expected, rtol=1e-5):
+    # Relative to the scale of the outputs, so that near-zero scores do not
+    # need an absolute tolerance of their own
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(
+        actual, expected, rtol=rtol, atol=rtol * np.abs(expected).max()
+    )
+
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+def test_fused_ensemble_matches_predict_ensemble(models, names, size):
+    from app.ensemble import FusedEnsemble
+
+    fused_ensemble = FusedEnsemble(
+        models["model_1"],
+        models["model_2"],
+        models["model_1_ins"],
+        models["model_2_ins"],
+    )
+    final_df = data_loading.final_df
+    stores = {name: getattr(data_loading, name) for name in STORES}
+    names = names[:size]
+
+    schemes, insurances = fused_ensemble.predict(
+        build_ensemble_inputs(
+            names, stores["x_store_1"], stores["x_store_2"], final_df
+        ),
+        build_ensemble_inputs(
+            names, stores["x_store_1_ins"], stores["x_store_2_ins"], final_df
+        ),
+    )
+    assert_close(
+        schemes,
+        predict_ensemble(
+            names,
+            models["model_1"],
+            models["model_2"],
+            stores["x_store_1"],
+            stores["x_store_2"],
+            final_df,
+        ),
+    )
+    assert_close(
+        insurances,
+        predict_ensemble(
+            names,
+            models["model_1_ins"],
+            models["model_2_ins"],
+            stores["x_store_1_ins"],
+            stores["x_store_2_ins"],
+            final_df,
+        ),
+    )
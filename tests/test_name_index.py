@@ -0,0 +1,27 @@
+from app.name_index import PostOfficeIndex
+
+NAMES = ["Ajmer H.O", "Ajmer City S.O", "Alwar B.O", "Barmer S.O", "Bikaner H.O"]
+
+
+def test_suggest_prefers_prefix_matches():
+    index = PostOfficeIndex(NAMES)
+    assert index.suggest("aj") == ["Ajmer City S.O", "Ajmer H.O"]
+    assert index.suggest("ajmer c") == ["Ajmer City S.O"]
+
+
+def test_suggest_falls_back_to_fuzzy_matches():
+    index = PostOfficeIndex(NAMES)
+    assert index.suggest("Bikanr H.O")[0] == "Bikaner H.O"
+    assert index.suggest("zzzz") == []
+
+
+def test_suggest_skips_the_fuzzy_pass_for_short_queries():
+    index = PostOfficeIndex(["Abc"])
+    assert index.fuzzy("Ac") == ["Abc"]
+    assert index.suggest("Ac") == []
+
+
+def test_fuzzy_matches_share_the_first_letter():
+    index = PostOfficeIndex(NAMES)
+    assert index.suggest("Axmer H.O")[0] == "Ajmer H.O"
+    assert index.suggest("jmer H.O") == []
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app import nbf_functions
+from app.name_index import PostOfficeIndex
+
+MONTHS = range(1, 13)
+
+
+def reference_demographic_weight(demographics_df, post_office_name, weights):
+    # The row by row formula the matrix product replaced
+    po_data = demographics_df[demographics_df["Post Office Name"] == post_office_name]
+    score = 0
+    for _, row in po_data.iterrows():
+        age_wt = weights.get("age_group", {}).get(row["Age Group"], 0)
+        gender_wt = weights.get("gender", {}).get(row["Gender"], 0)
+        occ_wt = weights.get("occupation", {}).get(row["Occupation"], 0)
+        income_wt = weights.get("income", {}).get(str(row["Income Level"]), 0)
+        score += row["Population"] * (age_wt + gender_wt + occ_wt + income_wt)
+    return score
+
+
+def reference_agriculture_weight(agriculture_df, district, current_month):
+    score = 0
+    for _, row in agriculture_df[agriculture_df["District"] == district].iterrows():
+        sowing = row["Sowing Period Numeric"]
+        harvesting = row["Harvesting Period Numeric"]
+        if sowing <= harvesting:
+            sowing_active = sowing <= current_month <= harvesting
+        else:
+            sowing_active = current_month >= sowing or current_month <= harvesting
+        if sowing_active:
+            score += 0.6
+        if current_month == harvesting:
+            score += 0.4
+    return score
+
+
+def reference_nbf(
+    demographics_df, agriculture_df, post_office_name, month, is_insurance
+):
+    scheme_weights = (
+        nbf_functions.SCHEME_WEIGHTS_INSURANCE
+        if is_insurance
+        else nbf_functions.SCHEME_WEIGHTS
+    )
+    district = demographics_df.loc[
+        demographics_df["Post Office Name"] == post_office_name, "District"
+    ].iloc[0]
+    agri_weight = reference_agriculture_weight(agriculture_df, district, month)
+    return pd.Series(
+        {
+            scheme_name: 0.7
+            * reference_demographic_weight(demographics_df, post_office_name, weights)
+            + 0.3 * agri_weight
+            for scheme_name, weights in scheme_weights.items()
+        }
+    )
+
+
+@pytest.fixture
+def small_tables(monkeypatch):
+    """
+    Rebuilds the NBF tables of app.nbf_functions from a handful of rows and
+    returns them.
+    """
+    demographics_df = pd.DataFrame(
+        {
+            "Post Office Name": ["A", "A", "A", "B", "B", "C", "C", "D"],
+            "District": ["North"] * 3 + ["South"] * 4 + ["East"],
+            "Age Group": [
+                "19-35", "60+", "0-18", "36-60", "19-35", "60+", "19-35", "36-60"
+            ],
+            "Gender": ["Male", "Female", "Female", "Male"] * 2,
+            "Occupation": [
+                "Farmer",
+                "Retired",
+                "Student",
+                "Salaried Individual",
+                "Business Owner",
+                "Retired",
+                "Farmer",
+                "Business Owner",
+            ],
+            "Income Level": [1, 2, 3, 4, 2, 3, 1, 2],
+            "Population": [120.0, 45.0, 80.0, 200.0, 35.0, np.nan, 60.0, 90.0],
+        }
+    )
+    agriculture_df = pd.DataFrame(
+        {
+            "District": ["North", "South", "South"],
+            "Season": ["Kharif", "Rabi", "Kharif"],
+            "Major Crops": ["Soybean", "Wheat, Gram", "Paddy (Rice)"],
+            "Sowing Period Numeric": [6, 11, 7],
+            "Harvesting Period Numeric": [9, 3, 10],
+        }
+    )
+
+    po_index = PostOfficeIndex(["A", "B", "C", "D", "E"])
+    has_rows, po_districts, segments, matrix = (
+        nbf_functions.encode_demographic_segments(demographics_df, po_index)
+    )
+    districts, calendar = nbf_functions.build_agriculture_calendar(agriculture_df)
+
+    monkeypatch.setattr(nbf_functions, "po_index", po_index)
+    monkeypatch.setattr(nbf_functions, "po_has_demographics", has_rows)
+    monkeypatch.setattr(nbf_functions, "po_districts", po_districts)
+    monkeypatch.setattr(nbf_functions, "segment_population", matrix)
+    monkeypatch.setattr(
+        nbf_functions,
+        "compiled_scheme_weights",
+        {
+            False: nbf_functions.compile_scheme_weights(
+                nbf_functions.SCHEME_WEIGHTS, segments
+            ),
+            True: nbf_functions.compile_scheme_weights(
+                nbf_functions.SCHEME_WEIGHTS_INSURANCE, segments
+            ),
+        },
+    )
+    monkeypatch.setattr(nbf_functions, "agriculture_districts", districts)
+    monkeypatch.setattr(nbf_functions, "agriculture_calendar", calendar)
+    return demographics_df, agriculture_df
+
+
+@pytest.mark.parametrize("is_insurance", [False, True])
+def test_calculate_nbf_matches_row_by_row_formula(small_tables, is_insurance):
+    demographics_df, agriculture_df = small_tables
+    for post_office_name in ["A", "B", "C", "D"]:
+        for month in MONTHS:
+            expected = reference_nbf(
+                demographics_df, agriculture_df, post_office_name, month, is_insurance
+            )
+            nbf = nbf_functions.calculate_nbf(post_office_name, month, is_insurance)
+            assert list(nbf.index) == list(expected.index)
+            np.testing.assert_allclose(nbf, expected, rtol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize("is_insurance", [False, True])
+def test_calculate_nbf_matrix_matches_row_by_row_formula(small_tables, is_insurance):
+    demographics_df, agriculture_df = small_tables
+    for month in MONTHS:
+        matrix = nbf_functions.calculate_nbf_matrix(month, is_insurance)
+        assert list(matrix.index) == ["A", "B", "C", "D"]
+        for post_office_name in matrix.index:
+            expected = reference_nbf(
+                demographics_df, agriculture_df, post_office_name, month, is_insurance
+            )
+            np.testing.assert_allclose(
+                matrix.loc[post_office_name, expected.index],
+                expected,
+                rtol=1e-12,
+                equal_nan=True,
+            )
+
+
+def test_missing_population_makes_scores_nan(small_tables):
+    assert nbf_functions.calculate_nbf("C", 6).isna().all()
+    assert nbf_functions.calculate_nbf("B", 6).notna().all()
+
+
+def test_post_office_without_demographics(small_tables):
+    assert not nbf_functions.has_demographics("E")
+    with pytest.raises(ValueError):
+        nbf_functions.calculate_nbf("E", 6)
+
+
+def test_agriculture_calendar_wraps_around_december():
+    agriculture_df = pd.DataFrame(
+        {
+            "District": ["Rabi district", "Kharif district"],
+            "Sowing Period Numeric": [11, 6],
+            "Harvesting Period Numeric": [3, 9],
+        }
+    )
+    districts, calendar = nbf_functions.build_agriculture_calendar(agriculture_df)
+
+    rabi = calendar[districts.get_loc("Rabi district")]
+    expected = np.zeros(12)
+    expected[[10, 11, 0, 1]] = 0.6  # November to February
+    expected[2] = 0.6 + 0.4  # Harvested in March
+    np.testing.assert_allclose(rabi, expected)
+
+    kharif = calendar[districts.get_loc("Kharif district")]
+    expected = np.zeros(12)
+    expected[[5, 6, 7]] = 0.6
+    expected[8] = 0.6 + 0.4
+    np.testing.assert_allclose(kharif, expected)
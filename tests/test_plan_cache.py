@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from app.plan_cache import PlanCache, plan_cache_key
+from app.promotion_plan import build_plan_messages
+
+
+def demographics(name, index, population, female_ratio):
+    return pd.DataFrame(
+        {
+            "Post Office Name": [name],
+            "total_population": [population],
+            "female_ratio": np.array([female_ratio], dtype=np.float64),
+            "Rural_Presence": [np.nan],
+        },
+        index=[index],
+    )
+
+
+def test_offices_with_nearly_the_same_profile_share_a_key():
+    first = demographics("Alpha B.O", 3, 12_340.0, 0.6126)
+    second = demographics("Beta S.O", 977, 12_410.0, 0.6081)
+    assert plan_cache_key("PPF", "details", first) == plan_cache_key(
+        "PPF", "details", second
+    )
+
+
+def test_prompt_gets_the_demographics_as_they_are():
+    prompt = build_plan_messages(
+        "PPF", "details", demographics("Alpha B.O", 3, 12_340.0, 0.6126)
+    )[1]["content"]
+    assert "Alpha B.O" in prompt and "12340" in prompt and "0.6126" in prompt
+
+
+def test_different_profiles_get_different_keys():
+    first = demographics("Alpha B.O", 3, 12_340.0, 0.61)
+    second = demographics("Alpha B.O", 3, 12_340.0, 0.55)
+    assert plan_cache_key("PPF", "details", first) != plan_cache_key(
+        "PPF", "details", second
+    )
+
+
+def test_plan_cache_round_trip(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.sqlite3"), max_entries=2)
+    assert cache.get("a") is None
+    cache.put("a", "PPF", "plan a")
+    assert cache.get("a") == "plan a"
+    cache.put("b", "PPF", "plan b")
+    cache.put("c", "PPF", "plan c")
+    assert len(cache) == 2
+    assert cache.stats()["hits"] == 1
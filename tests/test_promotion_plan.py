@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+import httpx
+import pandas as pd
+import pytest
+from groq import AsyncGroq
+from app import promotion_plan
+from tools import stub_chat_server
+
+
+class SlowStream:
+    """
+    A completion stream yielding one chunk, then hanging.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self.chunks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        self.chunks += 1
+        if self.chunks > 1:
+            await asyncio.sleep(3600)
+        delta = SimpleNamespace(content="Plan")
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeClient:
+    def __init__(self):
+        self.streams = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        assert kwargs["stream"]
+        self.streams.append(SlowStream())
+        return self.streams[-1]
+
+
+def test_streams_are_closed_on_timeout(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(promotion_plan, "async_client", client)
+    schemes = list(promotion_plan.post_office_schemes)[:2]
+    demographics = pd.DataFrame({"total_population": [1000.0]})
+
+    async def run():
+        return [
+            event
+            async for event in promotion_plan.stream_promotion_plans(
+                schemes, demographics, timeout=0.1
+            )
+        ]
+
+    events = asyncio.run(run())
+    assert [event for event, _ in events].count("plan_error") == 2
+    assert events[-1] == ("done", {"failed_schemes": schemes})
+    assert len(client.streams) == 2
+    assert all(stream.closed for stream in client.streams)
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    """
+    Points the plan generation at tools/stub_chat_server.py, served in process.
+    """
+    monkeypatch.setattr(stub_chat_server, "STUB_LATENCY_MS", 50)
+    monkeypatch.setattr(stub_chat_server, "STUB_FAILURE_RATE", 0)
+    monkeypatch.setattr(
+        stub_chat_server,
+        "stats",
+        {"requests": 0, "failures": 0, "in_flight": 0, "max_in_flight": 0},
+    )
+    client = AsyncGroq(
+        api_key="stub",
+        base_url="http://stub",
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=stub_chat_server.app)
+        ),
+    )
+    monkeypatch.setattr(promotion_plan, "async_client", client)
+    return stub_chat_server
+
+
+def generate(schemes, **kwargs):
+    demographics = pd.DataFrame({"total_population": [1000.0]})
+    return asyncio.run(
+        promotion_plan.generate_promotion_plans(schemes, demographics, **kwargs)
+    )
+
+
+def test_plans_fan_out_under_the_concurrency_limit(stub_server):
+    schemes = list(promotion_plan.post_office_schemes)[:6]
+    plans, failed = generate(schemes, concurrency=2)
+    assert [plan.scheme_name for plan in plans] == schemes and failed == []
+    assert all(scheme in plan.plan for scheme, plan in zip(schemes, plans))
+    assert stub_server.stats["max_in_flight"] == 2
+
+
+def test_plans_time_out_one_by_one(stub_server, monkeypatch):
+    monkeypatch.setattr(stub_server, "STUB_LATENCY_MS", 10_000)
+    schemes = list(promotion_plan.post_office_schemes)[:2]
+    start = time.perf_counter()
+    assert generate(schemes, timeout=0.1) == ([], schemes)
+    assert time.perf_counter() - start < 5
+    assert stub_server.stats["in_flight"] == 0
+
+
+def test_failed_plans_are_reported_with_the_others(stub_server, monkeypatch):
+    # Every other completion fails
+    outcomes = itertools.cycle([0.0, 1.0])
+    monkeypatch.setattr(stub_server, "STUB_FAILURE_RATE", 0.5)
+    monkeypatch.setattr(stub_server.random, "random", lambda: next(outcomes))
+    schemes = list(promotion_plan.post_office_schemes)[:4]
+    plans, failed = generate(schemes, concurrency=1)
+    assert [plan.scheme_name for plan in plans] == schemes[1::2]
+    assert failed == schemes[::2]
+
+
+def test_cancellation_is_not_a_failed_plan(monkeypatch):
+    async def cancelled(*args):
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(promotion_plan, "generate_promotion_plan_async", cancelled)
+    with pytest.raises(asyncio.CancelledError):
+        generate(list(promotion_plan.post_office_schemes)[:2])
+
+
+def test_promotion_plans_fail_with_502_when_every_plan_fails(
+    stub_server, monkeypatch
+):
+    from fastapi.testclient import TestClient
+    from app import main
+
+    monkeypatch.setattr(stub_server, "STUB_FAILURE_RATE", 1)
+    schemes = list(promotion_plan.post_office_schemes)[:2]
+    monkeypatch.setattr(promotion_plan, "collate_predictions", lambda *args: schemes)
+    post_office_name = promotion_plan.final_df["Post Office Name"].iloc[0]
+    response = TestClient(main.app).post(
+        "/promotion_plans", json={"post_office_name": post_office_name}
+    )
+    assert response.status_code == 502
+    assert stub_server.stats["failures"] == 2
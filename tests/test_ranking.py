@@ -0,0 +1,57 @@
+import numpy as np
+from app.data_loading import final_df
+from app.nbf_functions import calculate_nbf_matrix, has_demographics
+from app.recommendation_table import RecommendationTable
+from app.utils import (
+    SCHEME_OUTPUT_COLS,
+    past_records,
+    rank_schemes,
+    rank_schemes_bulk,
+)
+
+
+def scoreable_names(n):
+    names = [
+        name
+        for name in final_df["Post Office Name"].unique()
+        if name in past_records and has_demographics(name)
+    ]
+    return names[:n]
+
+
+def test_bulk_and_live_rankings_break_ties_alike():
+    names = scoreable_names(5)
+    past = np.stack([past_records.records(name) for name in names])
+    # No growth but for two schemes, so all the others score 0
+    grown = [SCHEME_OUTPUT_COLS[2], SCHEME_OUTPUT_COLS[5]]
+    preds = past.copy()
+    preds[:, [2, 5]] = np.where(past[:, [2, 5]] == 0, 1, past[:, [2, 5]] * 2)
+    top_n = len(SCHEME_OUTPUT_COLS)
+
+    bulk = rank_schemes_bulk(names, preds, calculate_nbf_matrix(4), top_n)
+    live = [
+        rank_schemes(name, pred, top_n, current_month=4)
+        for name, pred in zip(names, preds)
+    ]
+    assert bulk == live
+    tied = [col for col in SCHEME_OUTPUT_COLS if col not in grown]
+    for ranking in live:
+        assert [col for col in ranking if col not in grown] == tied
+
+
+def test_recommendation_table_is_only_looked_up_for_its_windows(tmp_path):
+    scores = np.array([[[0.0, 2.0, 1.0]]] * 12)
+    tables = {
+        "scheme": {
+            "names": np.array(["Alpha B.O"]),
+            "cols": np.array(["A", "B", "C"]),
+            "scores": scores,
+            "ranking": RecommendationTable.rank(scores),
+        }
+    }
+    path = str(tmp_path / "recommendations.npz")
+    RecommendationTable(tables, "v1", months=12).save(path)
+    table = RecommendationTable.load(path, "v1")
+
+    assert table.lookup(["Alpha B.O"], 3, 2, months=12) == [["B", "C"]]
+    assert table.lookup(["Alpha B.O"], 3, 2, months=23) is None
@@ -0,0 +1,22 @@
+from app.result_cache import ResultCache, SharedResultStore
+
+
+def test_shared_store_evicts_the_least_recently_used_rows(tmp_path):
+    store = SharedResultStore(str(tmp_path / "results.sqlite3"), max_bytes=25)
+    for key in "abc":
+        store.put(key, "g", key.encode() * 10)
+    assert len(store) == 2
+    assert store.get("a", "g") is None
+    assert store.get("c", "g") == b"c" * 10
+
+    store.put("big", "g", b"x" * 26)
+    assert store.get("big", "g") is None
+
+
+def test_result_cache_falls_back_to_the_shared_store(tmp_path):
+    shared = SharedResultStore(str(tmp_path / "results.sqlite3"))
+    ResultCache(1024, shared).put(("a", 1), "g", b"value")
+    cache = ResultCache(1024, shared)
+    assert cache.get(("a", 1), "g") == b"value"
+    assert cache.get(("a", 1), "other") is None
+    assert len(shared) == 0
@@ -0,0 +1,123 @@
+# tools/stub_chat_server.py
+"""
+Local stand-in for the Groq chat completion API, for exercising promotion
+plan generation without network access or an API key.
+
+    uvicorn tools.stub_chat_server:app --port 8001
+    GROQ_BASE_URL=http://127.0.0.1:8001 uvicorn app.main:app
+
+STUB_LATENCY_MS sets the delay of each completion and STUB_FAILURE_RATE the
+fraction of completions that fail with a 500. Streamed completions spread the
+delay over their chunks.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+STUB_LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "500"))
+STUB_FAILURE_RATE = float(os.environ.get("STUB_FAILURE_RATE", "0"))
+
+app = FastAPI(title="Stub chat completion server")
+
+stats = {"requests": 0, "failures": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def fake_plan(messages):
+    user_message = messages[-1]["content"] if messages else ""
+    scheme_line = next(
+        (line.strip() for line in user_message.splitlines() if "Scheme Name:" in line),
+        "Scheme Name: unknown",
+    )
+    return (
+        f"1. **Scheme Overview**: {scheme_line}\n"
+        "2. **Target Audience**: Farmers, salaried individuals and retired persons.\n"
+        "3. **Promotion Strategies**: Community meetings, SMS campaigns, pamphlets.\n"
+        "4. **Execution Timeline**: Four weeks.\n"
+        "5. **Key Metrics**: Number of enrollments."
+    )
+
+
+async def stream_completion(completion_id, model, content):
+    words = content.split(" ")
+    try:
+        for i, word in enumerate(words):
+            await asyncio.sleep(STUB_LATENCY_MS / 1000 / len(words))
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else " " + word},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        chunk["choices"] = [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+    if body.get("stream"):
+        if random.random() < STUB_FAILURE_RATE:
+            stats["failures"] += 1
+            stats["in_flight"] -= 1
+            raise HTTPException(status_code=500, detail="Stub failure")
+        return StreamingResponse(
+            stream_completion(
+                f"chatcmpl-{uuid.uuid4().hex}",
+                body.get("model", "stub"),
+                fake_plan(body.get("messages", [])),
+            ),
+            media_type="text/event-stream",
+        )
+
+    try:
+        await asyncio.sleep(STUB_LATENCY_MS / 1000)
+        if random.random() < STUB_FAILURE_RATE:
+            stats["failures"] += 1
+            raise HTTPException(status_code=500, detail="Stub failure")
+
+        content = fake_plan(body.get("messages", []))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 0,
+                "completion_tokens": len(content.split()),
+                "total_tokens": len(content.split()),
+            },
+        }
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.get("/stats")
+def get_stats():
+    return stats